@@ -6,14 +6,35 @@ type TerminatorResponse = {
   status?: string; // Make optional as error might not have it
   message?: string; // Make optional as error might not have it
   error?: string; // Add error field
+  job_id?: string; // Set when the agent accepts the command as a background job
+  status_url?: string; // Poll this path on the agent for the job's progress
+  events_url?: string; // Server-Sent Events stream of the job's progress on the agent
+  deduplicated?: boolean; // True when the agent answered with an earlier identical job
+  agent?: string; // Set by terminator_router: the workstation agent that took the command
 };
 
+// The agent queues commands (202 + job_id); the route waits for the job's
+// outcome so the chat shows what actually happened, including 404/500 failures.
+const RESULT_WAIT_SECONDS = 30; // per long-poll of /jobs/{id}/result (the agent caps it at 60)
+const RESULT_DEADLINE_MS = 180_000; // give up waiting (the job keeps running on the agent)
+
 // Define the expected shape of the incoming request body
 type TerminatorRequestBody = {
   app: string;
   action?: string | null;
+  target?: string; // Router only: name of the agent that must run the command
+  user?: string; // Router only: keeps this user's commands on the same agent
 };
 
+// FastAPI reports failures as { detail }; the chat page reads { error }
+function toClientResponse(data: TerminatorResponse & { detail?: unknown }): TerminatorResponse {
+  if (data.detail !== undefined && !data.error) {
+    const { detail, ...rest } = data;
+    return { ...rest, error: typeof detail === 'string' ? detail : JSON.stringify(detail) };
+  }
+  return data;
+}
+
 export default async function handler(
   req: NextApiRequest,
   res: NextApiResponse<TerminatorResponse>
@@ -32,7 +53,7 @@ export default async function handler(
   }
   // -----------------------------------------------------
 
-  const { app, action }: TerminatorRequestBody = req.body;
+  const { app, action, target, user }: TerminatorRequestBody = req.body;
 
   // Basic validation: ensure 'app' is provided
   if (!app) {
@@ -40,7 +61,8 @@ export default async function handler(
   }
 
   const terminatorExecuteUrl = `${terminatorBaseUrl.replace(/\/$/, '')}/execute`; // Ensure no trailing slash, add /execute
-  const payload = { app, action: action ?? null };
+  // target/user are only read by terminator_router; a single agent ignores them
+  const payload = { app, action: action ?? null, ...(target && { target }), ...(user && { user }) };
 
   console.log(`[API /api/terminator] Received request: ${JSON.stringify(payload)}`);
   console.log(`[API /api/terminator] Forwarding to: ${terminatorExecuteUrl}`);
@@ -74,8 +96,32 @@ export default async function handler(
 
     console.log(`[API /api/terminator] Response from agent (Status ${response.status}):`, agentResponseData);
 
-    // Forward the agent's status code and JSON response
-    res.status(response.status).json(agentResponseData);
+    if (response.status !== 202 || !agentResponseData.job_id) {
+      // Rejected before queuing (e.g. 422 validation, 429 queue full): forward as-is
+      return res.status(response.status).json(toClientResponse(agentResponseData));
+    }
+
+    // --- Wait for the queued job's result ---
+    const jobId = agentResponseData.job_id;
+    const resultUrl = `${terminatorBaseUrl.replace(/\/$/, '')}/jobs/${encodeURIComponent(jobId)}/result?wait=${RESULT_WAIT_SECONDS}`;
+    const deadline = Date.now() + RESULT_DEADLINE_MS;
+    while (Date.now() < deadline) {
+      const resultResponse = await fetch(resultUrl, { headers: { 'Accept': 'application/json' } });
+      const resultData = await resultResponse.json().catch(() => ({}));
+      if (resultResponse.status === 202) {
+        continue; // still queued or running
+      }
+      console.log(`[API /api/terminator] Job ${jobId} finished (Status ${resultResponse.status}):`, resultData);
+      return res.status(resultResponse.status).json({
+        ...toClientResponse(resultData),
+        job_id: jobId,
+        ...(agentResponseData.agent && { agent: agentResponseData.agent }),
+      });
+    }
+    return res.status(504).json({
+      error: `Terminator agent did not finish job ${jobId} within ${RESULT_DEADLINE_MS / 1000}s; it may still be running.`,
+      job_id: jobId,
+    });
 
   } catch (error: any) {
     console.error(`[API /api/terminator] Error connecting to Terminator agent at ${terminatorExecuteUrl}:`, error);
@@ -1,35 +1,51 @@
-import platform
-import subprocess
 import time
+IMPORT_STARTED = time.perf_counter() # start of the startup-time report
+import argparse
+import asyncio
+import itertools
+import json
+import ntpath
+import platform
 import logging
 import os
-import random
 import re # <-- Import re for code detection
-from datetime import datetime
-from fastapi import FastAPI, HTTPException
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel, Field
-import pyautogui
-import pygetwindow as gw # <-- Import pygetwindow
 # --- Add CORS --- 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from terminator_browser import BROWSER_URL_ARGS, BrowserLauncher, url_list
+from terminator_drivers import DRIVER_NAME, create_driver, get_driver, set_driver
+from terminator_files import detect_language, save_code
+from terminator_idempotency import IdempotencyCache, IdempotencyConflict
+from terminator_input import TYPING_MODE_AUTO, inject_text
+from terminator_instances import WARM_POOL_ALIASES, InstanceManager
+from terminator_jobs import PRIORITY_BULK, PRIORITY_INTERACTIVE, JobEngine, QueueFull, emit
+from terminator_logging import LOG_FILE, console, log_event, setup_logging
+from terminator_metrics import UNRESOLVED_APP, PhaseTimer, metrics
+from terminator_resolver import AppResolver
+from terminator_windows import is_focusable, launch_latency, wait_for_window, wait_until_active, window_registry
 
 # --- Platform Check ---
-if platform.system() != "Windows":
+# The simulated driver (TERMINATOR_DRIVER=simulated) runs anywhere
+if DRIVER_NAME == "windows" and platform.system() != "Windows":
     print("Error: This script is designed to run only on Windows.")
+    print("Set TERMINATOR_DRIVER=simulated to run against a simulated desktop.")
     exit()
 
 # --- Logging Setup ---
-logging.basicConfig(
-    filename='terminator_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# JSON lines to a rotating terminator_log.txt, written by a background thread
+setup_logging()
 
 # --- Application Path Mapping (Windows Only) ---
-# Use os.path.expandvars to handle environment variables like %USERNAME%, %LOCALAPPDATA%, %ProgramFiles%
+# Environment variables like %USERNAME%, %LOCALAPPDATA%, %ProgramFiles% are
+# expanded by the resolver when it builds its index (in the background, not
+# at import time), so the paths automatically follow the current user.
 # Ensure paths are correct for your system. These are common defaults.
-# Using os.path.expandvars makes it automatically use the current user's paths.
 APP_MAP = {
     # Common system apps
     "notepad": "notepad.exe",
@@ -40,26 +56,48 @@ APP_MAP = {
     "powershell": "powershell.exe",
 
     # Browsers
-    "chrome": os.path.expandvars(r"%ProgramFiles%\Google\Chrome\Application\chrome.exe"),
-    "firefox": os.path.expandvars(r"%ProgramFiles%\Mozilla Firefox\firefox.exe"),
-    "edge": os.path.expandvars(r"%ProgramFiles(x86)%\Microsoft\Edge\Application\msedge.exe"),
+    "chrome": r"%ProgramFiles%\Google\Chrome\Application\chrome.exe",
+    "firefox": r"%ProgramFiles%\Mozilla Firefox\firefox.exe",
+    "edge": r"%ProgramFiles(x86)%\Microsoft\Edge\Application\msedge.exe",
 
     # Development Tools
-    "vscode": os.path.expandvars(r"%LOCALAPPDATA%\Programs\Microsoft VS Code\Code.exe"),
+    "vscode": r"%LOCALAPPDATA%\Programs\Microsoft VS Code\Code.exe",
 
     # Microsoft Office (Common paths, might vary based on installation type/version)
-    "word": os.path.expandvars(r"%ProgramFiles%\Microsoft Office\root\Office16\WINWORD.EXE"),
-    "excel": os.path.expandvars(r"%ProgramFiles%\Microsoft Office\root\Office16\EXCEL.EXE"),
-    "powerpoint": os.path.expandvars(r"%ProgramFiles%\Microsoft Office\root\Office16\POWERPNT.EXE"),
+    "word": r"%ProgramFiles%\Microsoft Office\root\Office16\WINWORD.EXE",
+    "excel": r"%ProgramFiles%\Microsoft Office\root\Office16\EXCEL.EXE",
+    "powerpoint": r"%ProgramFiles%\Microsoft Office\root\Office16\POWERPNT.EXE",
 
     # Communication
-    "whatsapp": os.path.expandvars(r"%LOCALAPPDATA%\WhatsApp\WhatsApp.exe"),
-    "slack": os.path.expandvars(r"%LOCALAPPDATA%\slack\slack.exe"),
-    "teams": os.path.expandvars(r"%LOCALAPPDATA%\Microsoft\Teams\current\Teams.exe"),
+    "whatsapp": r"%LOCALAPPDATA%\WhatsApp\WhatsApp.exe",
+    "slack": r"%LOCALAPPDATA%\slack\slack.exe",
+    "teams": r"%LOCALAPPDATA%\Microsoft\Teams\current\Teams.exe",
 
     # Add more common apps as needed (ensure paths are tested on your system)
 }
 
+# --- Alias Synonyms ---
+# Alternative names people say for mapped apps. Near-misses not listed here
+# are still caught by the resolver's fuzzy matching.
+APP_SYNONYMS = {
+    "code": "vscode",
+    "vs code": "vscode",
+    "visual studio code": "vscode",
+    "google chrome": "chrome",
+    "microsoft edge": "edge",
+    "mozilla firefox": "firefox",
+    "microsoft word": "word",
+    "ms word": "word",
+    "microsoft excel": "excel",
+    "ms excel": "excel",
+    "microsoft powerpoint": "powerpoint",
+    "ppt": "powerpoint",
+    "microsoft teams": "teams",
+    "command prompt": "cmd",
+    "file explorer": "explorer",
+    "calculator app": "calc",
+}
+
 # --- Window Title Mapping for Activation ---
 # Use partial titles for better matching flexibility
 WINDOW_TITLE_MAP = {
@@ -79,27 +117,145 @@ WINDOW_TITLE_MAP = {
     # Add more as needed
 }
 
+# --- Code Saving ---
+# How code typed into an editor gets saved (TERMINATOR_SAVE_MODE, overridable per request):
+#   file: write it straight to TERMINATOR_OUTPUT_DIR and open that file in the editor
+#   gui:  type it, then drive the editor's Save As dialog (legacy, Notepad only)
+#   off:  just type it
+SAVE_MODE_FILE = "file"
+SAVE_MODE_GUI = "gui"
+SAVE_MODE_OFF = "off"
+SAVE_MODE = os.environ.get("TERMINATOR_SAVE_MODE", SAVE_MODE_FILE).lower()
+# Editors that are launched with the saved file as their argument
+FILE_FIRST_APPS = {"notepad", "vscode"}
+
+# --- Desktop Driver ---
+def simulated_titles():
+    """Window titles per executable stem, so simulated windows match WINDOW_TITLE_MAP."""
+    titles = {}
+    for alias, title in WINDOW_TITLE_MAP.items():
+        target = APP_MAP.get(alias)
+        if target:
+            titles[ntpath.splitext(ntpath.basename(target))[0]] = title
+    return titles
+
+# The Windows driver imports pyautogui & co. on first use (or during --warmup)
+if DRIVER_NAME == "simulated":
+    set_driver(create_driver("simulated", titles=simulated_titles()))
+    console("Running against the SIMULATED desktop driver (no real apps are launched).")
+
+# --- Job Engine ---
+# Desktop work runs on worker threads so the event loop stays responsive.
+# Jobs targeting the same window are serialized; jobs for different windows
+# overlap their spawns and window waits but take turns on the keyboard
+# (see desktop_input below).
+# At most TERMINATOR_MAX_QUEUE commands wait at once (429 beyond that); bulk
+# and batch work leaves TERMINATOR_INTERACTIVE_RESERVE slots to voice commands.
+job_engine = JobEngine(
+    workers=int(os.environ.get("TERMINATOR_WORKERS", "2")),
+    max_pending=int(os.environ.get("TERMINATOR_MAX_QUEUE", "100")),
+    interactive_reserve=int(os.environ["TERMINATOR_INTERACTIVE_RESERVE"]) if os.environ.get("TERMINATOR_INTERACTIVE_RESERVE") else None,
+)
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "bulk": PRIORITY_BULK}
+
+# --- Desktop Input ---
+# Every lane shares one foreground window and one keyboard. A job holds this
+# lock from activating its window until typing and auto-save are done, so
+# two workers never type into whichever window happens to have focus.
+# Launches and restores on other workers still move windows to the front,
+# so typing also re-activates its window before every key or paste.
+desktop_input = threading.Lock()
+
+# --- Duplicate Suppression ---
+# Retried or double-fired commands are answered by the job already running
+# (or recently finished) for the same idempotency key or identical payload.
+idempotency = IdempotencyCache()
+metrics.describe("commands_deduplicated_total", "Duplicate commands answered by an existing job, by reason.")
+
+# --- Executable Resolver ---
+# Built (or loaded from its on-disk cache) on a background thread once the
+# server starts, then refreshed there; early lookups wait for the first build.
+resolver = AppResolver(APP_MAP, synonyms=APP_SYNONYMS, static_index=get_driver().executable_index(APP_MAP))
+
+# --- App Instances ---
+# Tracks launched processes for reuse; TERMINATOR_WARM_POOL pre-launches heavy apps.
+instance_manager = InstanceManager()
+
+# --- Browser Launches ---
+# URLs sent within TERMINATOR_BROWSER_BATCH_MS of each other share one browser invocation
+browser_launcher = BrowserLauncher(instance_manager.launch)
+
+def start_warm_pool():
+    targets = {}
+    for alias in WARM_POOL_ALIASES:
+        resolution = resolver.resolve(alias)
+        if resolution is None:
+            console(f"Warm pool: alias '{alias}' could not be resolved, skipping.")
+            continue
+        targets[resolution.alias] = resolution.path
+    instance_manager.start_warm_pool(targets)
+
+# --- Startup ---
+# TERMINATOR_WARMUP=1 (or --warmup) pre-initializes everything that is
+# otherwise loaded lazily, in parallel, before the first request is served.
+WARMUP = os.environ.get("TERMINATOR_WARMUP", "0").lower() in ("1", "true", "yes")
+startup_report = {"import_ms": None, "ready_ms": None, "warmup": None}
+
+def warmup():
+    """Runs the lazy initializers concurrently. Returns {step: milliseconds or error}."""
+    steps = {
+        "driver": lambda: get_driver().preload(),
+        "resolver": resolver.wait_ready,
+        "code_detection": lambda: detect_language(""),
+    }
+
+    def timed(step):
+        started = time.perf_counter()
+        try:
+            steps[step]()
+        except Exception as e:
+            return f"failed: {e}"
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="terminator-warmup") as pool:
+        return dict(zip(steps, pool.map(timed, steps)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    resolver.start_background_refresh() # the initial build happens on this thread
+    instance_manager.start()
+    # The warm pool resolves aliases, so it waits for the index off the event loop
+    threading.Thread(target=start_warm_pool, name="terminator-warm-pool", daemon=True).start()
+    job_engine.start()
+    if WARMUP:
+        startup_report["warmup"] = await asyncio.to_thread(warmup)
+    startup_report["ready_ms"] = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
+    console(f"Startup: imported in {startup_report['import_ms']} ms, ready in {startup_report['ready_ms']} ms"
+            + (f", warmup {startup_report['warmup']}" if WARMUP else " (lazy initialization)"))
+    yield
+    job_engine.stop()
+    instance_manager.stop()
+    resolver.stop_background_refresh()
+
 # --- FastAPI Setup ---
 app = FastAPI(
     title="Terminator Agent",
     description="A local agent to control Windows applications via API calls.",
-    version="0.1.4" # <-- Version bump
+    version="0.2.0", # <-- Version bump: /execute now queues jobs
+    lifespan=lifespan,
 )
 
 # --- Add CORS Middleware ---
-# Allow requests from any origin during development. 
-# For production, you might want to restrict this to your Vercel app's URL.
-origins = [
-    "*", # Allows all origins
-    # Example for restricting to Vercel:
-    # "https://your-app-name.vercel.app", 
-    # "http://localhost:3000", # Allow local frontend dev server
-]
+# Browser origins allowed to call the agent, comma-separated in
+# TERMINATOR_CORS_ORIGINS (e.g. "https://your-app-name.vercel.app"); defaults
+# to the local frontend dev server. Use "*" to allow any origin.
+origins = [origin.strip() for origin in os.environ.get(
+    "TERMINATOR_CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",") if origin.strip()]
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
-    allow_credentials=True,
+    allow_credentials="*" not in origins, # credentials are never allowed with a wildcard
     allow_methods=["POST", "GET"], # Allow POST for /execute, GET for /
     allow_headers=["*"],
 )
@@ -108,7 +264,30 @@ app.add_middleware(
 # --- Request Model ---
 class ExecuteCommand(BaseModel):
     app: str = Field(..., description="The name or alias of the application (e.g., 'notepad', 'chrome')")
-    action: str | None = Field(None, description="Text/URL to type or command-specific parameter.")
+    action: str | None = Field(None, description="Text to type, or for a browser one or more URLs (space/comma separated) to open as tabs.")
+    typing_mode: Literal["auto", "human", "bulk"] = Field(TYPING_MODE_AUTO, description="How to enter the text: 'human' types key by key, 'bulk' pastes via the clipboard, 'auto' pastes only long text.")
+    reuse_instance: bool = Field(False, description="Focus an instance the agent already launched instead of opening a new one.")
+    priority: Literal["interactive", "bulk"] | None = Field(None, description="Scheduling lane: 'interactive' (voice commands) runs ahead of 'bulk'. Defaults to interactive for /execute and bulk for batch steps.")
+    save_mode: Literal["file", "gui", "off"] | None = Field(None, description="How to save code sent to an editor: 'file' writes it to disk and opens it, 'gui' types it and uses Save As, 'off' only types. Defaults to TERMINATOR_SAVE_MODE.")
+    debug: bool = Field(False, description="Include per-phase timings in the result.")
+    idempotency_key: str | None = Field(None, max_length=200, description="Client key identifying this command; repeats within TERMINATOR_IDEMPOTENCY_TTL return the original job. The Idempotency-Key header works too.")
+
+# --- Batch Request Models ---
+MAX_BATCH_STEPS = 50
+
+class BatchStep(ExecuteCommand):
+    independent: bool = Field(False, description="Run this step in parallel with the rest of the batch instead of after the previous step.")
+
+class ExecuteBatch(BaseModel):
+    steps: list[BatchStep] = Field(..., min_length=1, max_length=MAX_BATCH_STEPS, description="Commands to run, in order.")
+    stop_on_error: bool = Field(True, description="Skip the remaining sequential steps once one fails.")
+
+class StepContext:
+    """Window state handed from one sequential batch step to the next."""
+
+    def __init__(self):
+        self.alias = None  # resolved alias of the previous step
+        self.window = None # window the previous step typed into, if focused directly
 
 # --- Helper Function: Check if text looks like code ---
 def looks_like_code(text):
@@ -116,164 +295,551 @@ def looks_like_code(text):
     patterns = [
         r'\b(def|class|import|function|const|let|var|public|private|static|void|int|string|bool)\b',
         r'[{};()=/>]', # Common symbols
-        r'^(# |//|''')' # Starts with comment
+        r"^(# |//|''')" # Starts with comment
     ]
     # Check if multiple patterns match to increase confidence
     matches = sum(1 for pattern in patterns if re.search(pattern, text, re.MULTILINE))
     return matches >= 2 # Adjust threshold as needed
 
-# --- API Endpoint ---
-@app.post("/execute", summary="Execute an application control command")
-async def execute_action(command: ExecuteCommand):
+def report_typing(done, total):
+    """Typing progress callback: emits percentage-of-characters events for streaming clients."""
+    emit("typing", percent=round(done * 100 / total, 1) if total else 100.0, chars=done, total=total)
+
+# --- Command Runner (executes on a job worker thread) ---
+def run_command(command: ExecuteCommand, context: StepContext | None = None):
     """
     Opens a specified application and optionally types text into it or performs a special action.
 
     Looks up common application names in an internal map for full paths.
     Falls back to using the provided name directly if not found in the map.
     Attempts to activate the application window before typing.
-    Can launch Chrome directly with a URL.
-    Can attempt to auto-save code typed into Notepad.
+    Opens one or more URLs in a browser (Chrome, Edge, Firefox) as new tabs.
+    Code sent to an editor is written straight to disk and the editor is
+    opened on the saved file (or, in gui save mode, typed and auto-saved).
 
-    - **app**: Alias or executable name (e.g., 'notepad', 'chrome', 'calc.exe').
-    - **action**: Optional text/URL to type or command-specific parameter.
+    When a batch context is passed and the previous step typed into the same
+    app, the step types into that window again instead of launching a new instance.
+
+    Blocking by design: call it from a job worker, never from the event loop.
     """
     app_alias = command.app.lower()
     action_text = command.action
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    started = time.monotonic()
+    timer = PhaseTimer()
 
     # Log request (truncate long actions)
     action_log_display = (action_text[:50] + '...' if action_text and len(action_text) > 50 else action_text)
     log_message = f"Request received: app='{command.app}' (alias='{app_alias}'), action='{action_log_display}'"
-    logging.info(log_message)
-    print(f"{timestamp} - {log_message}")
+    log_event(logging.INFO, log_message, phase="received")
 
     # 1. Determine execution path/command & target window title
-    app_to_execute = APP_MAP.get(app_alias)
-    chrome_path = APP_MAP.get("chrome")
-    target_window_title = WINDOW_TITLE_MAP.get(app_alias)
+    resolve_started = time.monotonic()
+    resolution = resolver.resolve(app_alias)
+    if resolution is not None:
+        timer.app = resolution.alias
+    timer.record("resolve", time.monotonic() - resolve_started)
+    if resolution is None:
+        timer.fallback("alias_not_found")
+        metrics.inc("commands_total", app=UNRESOLVED_APP, outcome="not_found")
+        suggestions = resolver.suggestions(app_alias)
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        error_msg = f"Error: Command/Application '{command.app}' not found. Ensure it's in PATH or mapped correctly.{hint}"
+        log_event(logging.ERROR, error_msg, phase="resolve", duration_ms=(time.monotonic() - started) * 1000)
+        raise HTTPException(status_code=404, detail=error_msg)
 
-    if app_to_execute:
-        print(f"Mapped alias '{app_alias}' to '{app_to_execute}'")
-        if not os.path.exists(app_to_execute):
-            warning_msg = f"Warning: Mapped path for '{app_alias}' ('{app_to_execute}') does not exist. Trying alias directly."
-            logging.warning(warning_msg)
-            print(f"{timestamp} - {warning_msg}")
-            app_to_execute = command.app # Fallback to original input
-    else:
-        warning_msg = f"Warning: Alias '{app_alias}' not found in APP_MAP. Trying the name directly."
-        logging.warning(warning_msg)
-        print(f"{timestamp} - {warning_msg}")
-        app_to_execute = command.app
-
-    # --- Special Handling for Chrome URL --- 
-    is_chrome_url_launch = False
-    if app_alias == "chrome" and action_text and action_text.startswith(("http://", "https://")):
-        if chrome_path and os.path.exists(chrome_path):
-            app_to_execute = [chrome_path, action_text] # Command becomes list [app_path, url]
-            is_chrome_url_launch = True
-            print(f"Detected Chrome URL launch. Will execute: {app_to_execute}")
-        else:
-            print(f"Warning: Chrome path not found ('{chrome_path}'). Falling back to typing URL.")
+    app_to_execute = resolution.path
+    if resolution.how != "exact":
+        console(f"Resolved '{app_alias}' to '{resolution.alias}' via {resolution.how} match")
+        timer.fallback(f"alias_{resolution.how}")
+    app_alias = resolution.alias
+    console(f"Mapped alias '{app_alias}' to '{app_to_execute}'")
+    emit("resolved", alias=app_alias, path=app_to_execute, how=resolution.how)
+    target_window_title = WINDOW_TITLE_MAP.get(app_alias)
 
+    # --- Browser URL Launch ---
+    # One or more URLs for a browser open as tabs, batched with other URL commands
+    browser_urls = url_list(action_text) if app_alias in BROWSER_URL_ARGS else None
+    if browser_urls:
+        console(f"Detected {app_alias} URL launch for {len(browser_urls)} URL(s).")
+
+    # --- File-First Save for Code ---
+    saved_file = None
+    save_mode = command.save_mode or SAVE_MODE
+    if (save_mode == SAVE_MODE_FILE and app_alias in FILE_FIRST_APPS and action_text
+            and looks_like_code(action_text)):
+        try:
+            with timer.phase("save"):
+                saved_file = save_code(action_text)
+        except OSError as save_error:
+            error_msg = f"Error: Could not save code to disk: {save_error}"
+            metrics.inc("commands_total", app=app_alias, outcome="error")
+            log_event(logging.ERROR, error_msg, phase="save", duration_ms=(time.monotonic() - started) * 1000)
+            raise HTTPException(status_code=500, detail=error_msg)
+        console(f"Saved {saved_file.language} code to {saved_file.path}")
+        emit("saved", path=saved_file.path, language=saved_file.language)
+        app_to_execute = [app_to_execute, saved_file.path] # Editor opens the saved file
+    opens_with_argument = bool(browser_urls) or saved_file is not None
+
+    # --- Batch Reuse: keep typing into the window the previous step used ---
+    reused_window = None
+    if (context is not None and context.alias == app_alias and context.window is not None
+            and action_text and not opens_with_argument and is_focusable(context.window)):
+        reused_window = context.window
+
+    holds_input = False
     try:
-        # 2. Open the application
-        print(f"Attempting to execute: {app_to_execute}")
-        process = subprocess.Popen(app_to_execute) # Popen handles list or string
-        print(f"Process started with PID: {process.pid}")
+        instance = None
+        spawned_at = None
+        if reused_window is not None:
+            console(f"Reusing window from previous step: {reused_window.title}")
+            log_message_action = f"Action performed: Reused '{command.app}' window from previous step"
+        else:
+            # 2. Open the application (or take over a warm/running instance)
+            if not opens_with_argument:
+                with timer.phase("acquire"):
+                    instance = instance_manager.acquire(app_alias, reuse_running=command.reuse_instance)
+            if instance is not None:
+                console(f"Reusing {instance.origin} '{app_alias}' instance (PID: {instance.pid})")
+                emit("spawned", pid=instance.pid, origin=instance.origin)
+                log_message_action = f"Action performed: Focused {instance.origin} '{command.app}' instance (PID {instance.pid})"
+            elif browser_urls:
+                spawned_at = time.monotonic()
+                with timer.phase("spawn"):
+                    launch = browser_launcher.open(app_alias, app_to_execute, browser_urls).result()
+                instance = launch.instance
+                console(f"Opened {len(launch.urls)} URL(s) from {launch.batch_size} command(s) in one '{app_alias}' launch (PID: {instance.pid})")
+                emit("spawned", pid=instance.pid, origin=instance.origin, urls=len(launch.urls), batched_commands=launch.batch_size)
+                log_message_action = f"Action performed: Opened {len(browser_urls)} URL(s) in '{command.app}'"
+            else:
+                console(f"Attempting to execute: {app_to_execute}")
+                spawned_at = time.monotonic()
+                with timer.phase("spawn"):
+                    instance = instance_manager.launch(app_alias, app_to_execute)
+                console(f"Process started with PID: {instance.pid}")
+                emit("spawned", pid=instance.pid, origin=instance.origin)
+                log_message_action = f"Action performed: Opened '{command.app}' (executed as '{str(app_to_execute)[:50]}...')"
 
         # 3. Perform action (typing) IF NOT handled differently
-        log_message_action = f"Action performed: Opened '{command.app}' (executed as '{str(app_to_execute)[:50]}...')"
-
-        if action_text and not is_chrome_url_launch:
-            # --- Intelligent Wait & Focus --- 
-            wait_time = 3.5 if app_alias in ["vscode", "word", "excel", "powerpoint"] else 2.5
-            print(f"Waiting {wait_time:.1f} seconds for app focus...")
-            time.sleep(wait_time)
-            activated = False
-            if target_window_title:
+        target_window = None
+        activated = False
+        will_type = bool(action_text) and not opens_with_argument
+        # A reused instance gets focused even when there is nothing to type
+        if will_type or (instance is not None and spawned_at is None):
+            # --- Wait for Window Readiness & Focus ---
+            if reused_window is not None:
+                target_window = reused_window
+            else:
+                console(f"Waiting for window (title: '{target_window_title}', PID: {instance.pid})...")
+                with timer.phase("window_wait"):
+                    target_window = wait_for_window(app_alias, target_window_title, pid=instance.pid,
+                                                    started_at=spawned_at, record=spawned_at is not None,
+                                                    process=instance.process)
+                if target_window is not None and spawned_at is not None:
+                    console(f"Window ready after {time.monotonic() - spawned_at:.2f}s: {target_window.title}")
+            with timer.phase("input_wait"):
+                desktop_input.acquire()
+            holds_input = True
+            if target_window is not None:
                 try:
-                    print(f"Attempting to find and activate window with title containing: '{target_window_title}'")
-                    windows = gw.getWindowsWithTitle(target_window_title)
-                    if windows:
-                        target_window = windows[0]
+                    with timer.phase("activate"):
                         if not target_window.isActive:
                              target_window.activate()
-                             print(f"Activated window: {target_window.title}")
-                             time.sleep(0.5)
+                             wait_until_active(target_window)
+                             console(f"Activated window: {target_window.title}")
                         else:
-                             print(f"Window '{target_window.title}' already active.")
-                        activated = True
-                    else:
-                        print(f"No window found with title containing '{target_window_title}'.")
+                             console(f"Window '{target_window.title}' already active.")
+                    activated = True
+                    emit("window_ready", title=target_window.title, focused=True)
                 except Exception as focus_error:
-                    print(f"Error activating window '{target_window_title}': {focus_error}. Falling back to Alt+Tab.")
+                    console(f"Error activating window '{target_window.title}': {focus_error}. Falling back to Alt+Tab.")
+                    timer.fallback("activate_failed")
+                    emit("window_ready", title=target_window.title, focused=False)
             else:
-                 print("No target window title mapped. Skipping direct activation.")
-            
-            if not activated:
-                print("Activating via Alt+Tab fallback...")
-                pyautogui.hotkey('alt', 'tab')
-                time.sleep(0.7)
+                console(f"No focusable window found for '{app_alias}' within the readiness ceiling.")
+                timer.fallback("window_not_found")
+                emit("window_ready", title=None, focused=False)
+
+            if not activated and will_type:
+                console("Activating via Alt+Tab fallback...")
+                timer.fallback("alt_tab")
+                with timer.phase("activate"):
+                    get_driver().hotkey('alt', 'tab')
+                    time.sleep(0.7)
+                target_window = None
             # --------------------------------
 
-            print(f"Attempting to type: '{action_text[:50]}...'" ) # Log truncated action
+        if will_type:
+            console(f"Attempting to type: '{action_text[:50]}...'" ) # Log truncated action
+            keep_focus = None
+            if activated:
+                def keep_focus():
+                    if target_window.isActive:
+                        return
+                    console(f"Window '{target_window.title}' lost focus while typing; re-activating.")
+                    timer.fallback("focus_lost")
+                    try:
+                        target_window.activate()
+                    except Exception as focus_error:
+                        console(f"Error re-activating window '{target_window.title}': {focus_error}")
+                    wait_until_active(target_window)
             try:
-                interval = random.uniform(0.03, 0.07)
-                pyautogui.write(action_text, interval=interval)
-                print(f"Typing complete (interval: {interval:.3f}s).")
+                typing_started = time.monotonic()
+                with timer.phase("type"):
+                    injection = inject_text(action_text, command.typing_mode, progress=report_typing, focus=keep_focus)
+                console(f"Typing complete ({injection}, {time.monotonic() - typing_started:.2f}s).")
                 log_message_action = f"Action performed: Typed '{action_text[:50]}...' into '{command.app}' (executed as '{str(app_to_execute)[:50]}...')"
 
-                # --- Auto-Save Logic for Notepad Code ---
-                if app_alias == "notepad" and looks_like_code(action_text):
-                    print("Detected code in Notepad, attempting auto-save...")
+                # --- GUI Auto-Save Logic for Notepad Code ---
+                if save_mode == SAVE_MODE_GUI and app_alias == "notepad" and looks_like_code(action_text):
+                    console("Detected code in Notepad, attempting auto-save...")
                     try:
-                        pyautogui.hotkey('ctrl', 's')
-                        time.sleep(1.2) # Wait for Save As dialog
-                        filename = "generated_code.txt"
-                        print(f"Typing filename: {filename}")
-                        pyautogui.write(filename)
-                        time.sleep(0.5)
-                        pyautogui.press('enter')
-                        print("Auto-save sequence completed.")
+                        with timer.phase("autosave"):
+                            get_driver().hotkey('ctrl', 's')
+                            time.sleep(1.2) # Wait for Save As dialog
+                            filename = "generated_code.txt"
+                            console(f"Typing filename: {filename}")
+                            get_driver().write(filename)
+                            time.sleep(0.5)
+                            get_driver().press('enter')
+                        console("Auto-save sequence completed.")
+                        emit("saved", path=filename, method="gui")
                         log_message_action += f" and attempted auto-save as '{filename}'"
                     except Exception as save_error:
-                        print(f"Error during auto-save attempt: {save_error}")
+                        console(f"Error during auto-save attempt: {save_error}")
+                        timer.fallback("autosave_failed")
                         log_message_action += " but auto-save failed."
                 # -------------------------------------------
 
             except Exception as pgui_error:
                  error_msg = f"Error during typing action: {str(pgui_error)}"
-                 logging.error(error_msg)
-                 print(f"{timestamp} - {error_msg}")
+                 log_event(logging.ERROR, error_msg, phase="type")
+                 timer.fallback("typing_failed")
                  log_message_action = f"Action performed: Opened '{command.app}', but failed to type: {str(pgui_error)}"
 
-        # Log final action message
-        logging.info(log_message_action)
-        print(f"{timestamp} - {log_message_action}")
+        if holds_input:
+            desktop_input.release()
+            holds_input = False
+
+        if context is not None:
+            context.alias = app_alias
+            context.window = target_window if activated else None
 
-        return {"status": "success", "message": log_message_action}
+        # Log final action message
+        timer.record("total", time.monotonic() - started)
+        metrics.inc("commands_total", app=app_alias, outcome="success")
+        if saved_file is not None:
+            log_message_action = f"Action performed: Saved {saved_file.language} code to '{saved_file.path}' and opened it in '{command.app}'"
+        # Phase timings and fallbacks feed the log analytics (terminator_logstats.py)
+        log_event(logging.INFO, log_message_action, phase="done", duration_ms=(time.monotonic() - started) * 1000,
+                  timings=timer.timings, fallbacks=timer.fallbacks)
+
+        result = {"status": "success", "message": log_message_action}
+        if saved_file is not None:
+            result["saved_path"] = saved_file.path
+            result["language"] = saved_file.language
+        if command.debug:
+            result["timings"] = timer.timings
+        return result
 
     except FileNotFoundError:
+        resolver.invalidate() # The index is stale; rebuild it now in the background
         error_msg = f"Error: Command/Application '{str(app_to_execute)}' not found. Ensure it's in PATH or mapped correctly."
-        logging.error(error_msg)
-        print(f"{timestamp} - {error_msg}")
+        metrics.inc("commands_total", app=app_alias, outcome="not_found")
+        log_event(logging.ERROR, error_msg, phase="spawn", duration_ms=(time.monotonic() - started) * 1000)
         raise HTTPException(status_code=404, detail=error_msg)
     except Exception as e:
         error_msg = f"An unexpected error occurred while trying to execute '{str(app_to_execute)}': {str(e)}"
-        logging.error(error_msg)
-        print(f"{timestamp} - {error_msg}")
+        metrics.inc("commands_total", app=app_alias, outcome="error")
+        log_event(logging.ERROR, error_msg, phase="error", duration_ms=(time.monotonic() - started) * 1000)
         raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        if holds_input:
+            desktop_input.release()
+
+def window_target(app_alias):
+    """Lane key used to serialize jobs that act on the same window."""
+    return WINDOW_TITLE_MAP.get(app_alias, app_alias)
+
+_url_lanes = itertools.count(1)
+
+def lane_alias(app):
+    """
+    The alias a command will run as, so synonyms ('code'/'vscode') and fuzzy
+    names ('calculatr') share the lane of the app they resolve to.
+    Until the resolver's first build is done only synonyms are applied,
+    since submitting must not block the event loop.
+    """
+    app_alias = app.lower()
+    if resolver.ready:
+        resolution = resolver.resolve(app_alias)
+        if resolution is not None:
+            return resolution.alias
+    return APP_SYNONYMS.get(app_alias, app_alias)
+
+def command_target(command: ExecuteCommand):
+    """
+    Lane key for a command. Browser URL launches never touch a window, so
+    each gets its own lane and concurrent ones can share a browser launch.
+    """
+    app_alias = lane_alias(command.app)
+    if app_alias in BROWSER_URL_ARGS and url_list(command.action):
+        return f"{app_alias} urls #{next(_url_lanes)}"
+    return window_target(app_alias)
+
+def command_priority(command: ExecuteCommand, default="interactive"):
+    return PRIORITIES[command.priority or default]
+
+def submit_command(command: ExecuteCommand, context: StepContext | None = None, default_priority="interactive"):
+    """Queues a command on the lane of the window it targets. Raises QueueFull when saturated."""
+    return job_engine.submit(command_target(command), run_command, command, context,
+                             description=f"app='{command.app}'", log_fields={"app": command.app.lower()},
+                             priority=command_priority(command, default_priority))
+
+def admit_command(command: ExecuteCommand, header_key: str | None = None):
+    """Submits a command unless a live job already answers for it; returns an Admission."""
+    payload = command.model_dump(exclude={"idempotency_key", "debug", "priority"})
+    payload["app"] = payload["app"].lower()
+    admission = idempotency.submit(payload, lambda: submit_command(command),
+                                   key=command.idempotency_key or header_key)
+    if admission.reused:
+        metrics.inc("commands_deduplicated_total", reason=admission.reason)
+        log_event(logging.INFO, f"Duplicate command for '{command.app}' coalesced into job {admission.job.id}",
+                  phase="admission", reason=admission.reason)
+    return admission
+
+def job_timings(job):
+    """Queue and run time of a finished job, in milliseconds."""
+    started = job.started_at or job.finished_at or job.created_at
+    return {
+        "queue_ms": round((started - job.created_at) * 1000, 1),
+        "run_ms": round(((job.finished_at or started) - started) * 1000, 1),
+    }
+
+# --- API Endpoints ---
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request, exc: QueueFull):
+    """Backpressure: tell the client to come back later instead of piling up desktop work."""
+    log_event(logging.WARNING, f"Rejected {request.url.path}: {exc}", phase="admission", retry_after=exc.retry_after)
+    return JSONResponse(status_code=429, headers={"Retry-After": str(exc.retry_after)},
+                        content={"detail": str(exc), "retry_after": exc.retry_after})
+
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict_handler(request, exc: IdempotencyConflict):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.post("/execute", summary="Queue an application control command", status_code=202)
+async def execute_action(command: ExecuteCommand, idempotency_key: str | None = Header(None)):
+    """
+    Queues a command for the desktop workers and returns immediately with a job id.
+
+    - **app**: Alias or executable name (e.g., 'notepad', 'chrome', 'calc.exe').
+    - **action**: Optional text/URL to type or command-specific parameter.
+
+    Poll `/jobs/{job_id}` for progress or `/jobs/{job_id}/result` for the outcome,
+    or stream progress events from `/jobs/{job_id}/events`. A duplicate of a
+    command that is still running or just finished gets the original job back
+    (`deduplicated: true`) instead of executing again.
+    """
+    job, reused, _reason = admit_command(command, idempotency_key)
+    message = (f"Duplicate of job {job.id} for '{command.app}'; not executed again." if reused
+               else f"Command for '{command.app}' queued as job {job.id}.")
+    return {
+        "status": "accepted",
+        "message": message,
+        "deduplicated": reused,
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+@app.post("/execute/stream", summary="Run a command and stream its progress")
+async def execute_stream(command: ExecuteCommand, idempotency_key: str | None = Header(None)):
+    """
+    Queues a command like /execute, but answers with a Server-Sent Events stream
+    of its progress: queued, started, resolved, spawned (pid), window_ready,
+    typing (percent of characters), saved and finally done or error.
+    Duplicates stream the events of the original job.
+    """
+    job = admit_command(command, idempotency_key).job
+    return event_stream_response(job)
+
+@app.post("/execute/batch", summary="Run a sequence of commands in one request")
+async def execute_batch(batch: ExecuteBatch):
+    """
+    Runs several commands and returns every step's result and timings together.
+
+    Steps run in order, each after the previous one finished. Consecutive steps
+    on the same app type into the window the previous step used rather than
+    launching the app again. Steps marked **independent** are started right
+    away and run in parallel with the sequence.
+    """
+    batch_started = time.monotonic()
+    results = [None] * len(batch.steps)
+    # Admit the whole batch up front rather than failing halfway through;
+    # sequential steps only ever occupy one queue slot at a time.
+    independent = [step for step in batch.steps if step.independent]
+    job_engine.check_capacity(len(independent) + (len(independent) < len(batch.steps)), PRIORITY_BULK)
+    parallel_jobs = {index: submit_command(step, default_priority="bulk")
+                     for index, step in enumerate(batch.steps) if step.independent}
+
+    def step_result(index, job):
+        result = {"step": index, "app": batch.steps[index].app, "state": job.state, "job_id": job.id}
+        if job.error is not None:
+            result.update({"status_code": job.status_code, "error": job.error})
+        else:
+            result.update(job.result or {})
+        result.update(job_timings(job))
+        return result
+
+    context = StepContext()
+    failed = False
+    for index, step in enumerate(batch.steps):
+        if step.independent:
+            continue
+        if failed and batch.stop_on_error:
+            results[index] = {"step": index, "app": step.app, "state": "skipped"}
+            continue
+        try:
+            job = submit_command(step, context, default_priority="bulk")
+        except QueueFull as e:
+            results[index] = {"step": index, "app": step.app, "state": "rejected", "status_code": 429,
+                              "error": str(e), "retry_after": e.retry_after}
+            failed = True
+            continue
+        await job.wait_done_async()
+        results[index] = step_result(index, job)
+        failed = failed or job.error is not None
+
+    for index, job in parallel_jobs.items():
+        await job.wait_done_async()
+        results[index] = step_result(index, job)
+
+    succeeded = sum(1 for result in results if result["state"] == "succeeded")
+    status = "success" if succeeded == len(results) else ("failed" if succeeded == 0 else "partial")
+    return {
+        "status": status,
+        "message": f"{succeeded}/{len(results)} steps succeeded.",
+        "steps": results,
+        "total_ms": round((time.monotonic() - batch_started) * 1000, 1),
+    }
+
+@app.get("/jobs/{job_id}", summary="Get the status of a queued command")
+async def get_job(job_id: str):
+    """Returns the current state of a job, including its result once finished."""
+    job = job_engine.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result", summary="Get the result of a queued command")
+async def get_job_result(job_id: str, wait: float = 0.0):
+    """
+    Returns the command result in the same shape the old synchronous /execute used.
+
+    - **wait**: Optional seconds to wait for the job to finish (max 60).
+    Responds 202 while the job is still queued or running.
+    """
+    job = job_engine.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    if wait > 0 and not job.finished:
+        await job.wait_done_async(min(wait, 60.0))
+    if not job.finished:
+        return JSONResponse(status_code=202, content={"status": job.state, "job_id": job.id})
+    if job.error is not None:
+        raise HTTPException(status_code=job.status_code, detail=job.error)
+    return job.result
+
+# --- Progress Streaming (Server-Sent Events) ---
+SSE_KEEPALIVE_SECONDS = 15.0
+TERMINAL_EVENTS = ("done", "error")
+
+def format_sse(event):
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+async def job_events(job, after=0):
+    """Yields a job's events as SSE frames until its done/error event."""
+    while True:
+        events = await job.wait_events_async(after, SSE_KEEPALIVE_SECONDS)
+        if not events:
+            yield ": keep-alive\n\n" # stops proxies from closing an idle stream
+            continue
+        for event in events:
+            yield format_sse(event)
+        after = events[-1]["seq"] + 1
+        if events[-1]["event"] in TERMINAL_EVENTS:
+            return
+
+def event_stream_response(job, after=0):
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Job-Id": job.id}
+    return StreamingResponse(job_events(job, after), media_type="text/event-stream", headers=headers)
+
+@app.get("/jobs/{job_id}/events", summary="Stream the progress of a queued command")
+async def stream_job_events(job_id: str, last_event_id: str | None = Header(None)):
+    """
+    Server-Sent Events stream of a job's progress, replayed from the start.
+    Reconnecting clients resume after the Last-Event-ID they received.
+    """
+    job = job_engine.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    after = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    return event_stream_response(job, after)
+
+def job_engine_gauges():
+    stats = job_engine.stats()
+    gauges = [("jobs_pending", {}, stats["pending"]), ("jobs_running", {}, stats["running"]),
+              ("queue_capacity", {}, stats["max_pending"])]
+    gauges += [("queue_depth", {"priority": name}, depth) for name, depth in stats["pending_by_priority"].items()]
+    return gauges
+
+metrics.describe("queue_depth", "Commands waiting for a desktop worker, by priority lane.")
+metrics.describe("queue_capacity", "Maximum number of commands allowed to wait (TERMINATOR_MAX_QUEUE).")
+metrics.describe("jobs_pending", "Commands queued and waiting for a desktop worker.")
+metrics.describe("jobs_running", "Commands currently executing on a desktop worker.")
+metrics.add_gauge_source(job_engine_gauges)
+
+@app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-phase latency histograms, fallback counters and job gauges in Prometheus format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/launch-latency", summary="Learned app launch latencies")
+async def get_launch_latency():
+    """Per-alias histogram of how long spawned apps take to show a focusable window."""
+    return launch_latency.snapshot()
+
+@app.get("/instances", summary="App instances launched by the agent")
+async def get_instances():
+    """Tracked app processes, including unclaimed warm-pool instances."""
+    return instance_manager.snapshot()
+
+@app.get("/windows", summary="Windows owned by spawned processes")
+async def get_windows():
+    """Snapshot of the PID -> window registry used to target typing."""
+    return window_registry.snapshot()
 
 # --- Health Check Endpoint ---
 @app.get("/", summary="Health check")
 async def root():
     """Basic health check endpoint."""
-    return {"message": "Terminator Agent is running."}
+    return {"message": "Terminator Agent is running.", "driver": get_driver().name, "startup": startup_report,
+            "jobs": job_engine.stats(), "resolver": resolver.stats(), "idempotency": idempotency.stats(),
+            "browser": browser_launcher.stats()}
+
+startup_report["import_ms"] = round((time.perf_counter() - IMPORT_STARTED) * 1000, 1)
 
 # --- Main Execution Block ---
 if __name__ == "__main__":
     import uvicorn
-    print("Starting Terminator Agent on http://127.0.0.1:8000")
+    parser = argparse.ArgumentParser(description="Terminator Agent")
+    parser.add_argument("--warmup", action="store_true",
+                        help="Pre-initialize the desktop driver, resolver index and code detection in parallel before serving.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    WARMUP = args.warmup or WARMUP
+    print(f"Starting Terminator Agent on http://{args.host}:{args.port}")
     print("Ensure this terminal remains open.")
-    print("Logs will be written to terminator_log.txt")
-    uvicorn.run(app, host="127.0.0.1", port=8000) 
\ No newline at end of file
+    print(f"Logs will be written to {LOG_FILE} (JSON lines, rotated)")
+    uvicorn.run(app, host=args.host, port=args.port) 
\ No newline at end of file
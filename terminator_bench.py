@@ -0,0 +1,270 @@
+"""
+Load benchmark for the Terminator Agent and the VAPI integration.
+
+Runs on any OS: unless --url points at a running agent, the agent is loaded
+in-process with the simulated desktop driver, so no real apps are launched.
+
+    python terminator_bench.py --requests 200 --concurrency 16
+    python terminator_bench.py --url http://127.0.0.1:8000 --requests 50
+    python terminator_bench.py --json --fail-p99-ms 2000   # CI regression gate
+    python terminator_bench.py --startup 10                # cold start report
+
+Reports throughput plus p50/p99 of the /execute accept latency (time to the
+202) and of the completion latency (until the job result is available), and
+the same for process_vapi_data driven against a simulated Terminator client.
+--startup instead starts the agent in fresh interpreters and reports import,
+ready and first-response times, with lazy initialization and with warmup.
+"""
+import argparse
+import asyncio
+import atexit
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Must be set before terminator_agent is imported. The log and saved files of
+# a run go to a scratch directory, not into the repository.
+BENCH_DIR = tempfile.mkdtemp(prefix="terminator_bench_")
+atexit.register(shutil.rmtree, BENCH_DIR, ignore_errors=True)
+os.environ.setdefault("TERMINATOR_DRIVER", "simulated")
+os.environ.setdefault("TERMINATOR_CONSOLE", "0")
+os.environ.setdefault("TERMINATOR_LOG_FILE", os.path.join(BENCH_DIR, "terminator_log.txt"))
+os.environ.setdefault("TERMINATOR_OUTPUT_DIR", os.path.join(BENCH_DIR, "generated_code"))
+
+import httpx
+
+DEFAULT_APPS = "notepad,calc,vscode,word"
+CODE_LINE = "# generated by the benchmark\nprint('hello from the simulated desktop')\n"
+
+
+# --- Statistics ---
+def percentile(samples, fraction):
+    """Nearest-rank percentile of samples (seconds), or None when empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(samples, elapsed, errors=0):
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+    return {
+        "requests": len(samples) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": ms(percentile(samples, 0.50)),
+        "p99_ms": ms(percentile(samples, 0.99)),
+        "max_ms": ms(max(samples) if samples else None),
+    }
+
+
+# --- Workload ---
+def make_payloads(count, apps, text_size, typing_mode, reuse):
+    text = (CODE_LINE * (text_size // len(CODE_LINE) + 1))[:text_size] if text_size else None
+    payloads = []
+    for index, app in enumerate(itertools.islice(itertools.cycle(apps), count)):
+        # A unique key per command keeps the agent from coalescing identical payloads
+        # save_mode "off": the code payload is typed, not written to disk by the file-first save
+        payload = {"app": app, "typing_mode": typing_mode, "reuse_instance": reuse, "save_mode": "off",
+                   "idempotency_key": f"bench-{os.getpid()}-{index}"}
+        if text:
+            payload["action"] = text
+        payloads.append(payload)
+    return payloads
+
+async def run_one(client, payload, result_wait):
+    """POSTs one command and waits for its result; returns (accept_s, complete_s, ok)."""
+    started = time.monotonic()
+    response = await client.post("/execute", json=payload)
+    accepted = time.monotonic() - started
+    if response.status_code != 202:
+        return accepted, None, False
+    job_id = response.json()["job_id"]
+    while True:
+        result = await client.get(f"/jobs/{job_id}/result", params={"wait": result_wait})
+        if result.status_code != 202:
+            return accepted, time.monotonic() - started, result.status_code == 200
+
+async def run_execute(client, payloads, concurrency, result_wait=30.0):
+    accept, complete = [], []
+    errors = 0
+    pending = iter(payloads)
+
+    async def worker():
+        nonlocal errors
+        for payload in pending:
+            accepted, completed, ok = await run_one(client, payload, result_wait)
+            accept.append(accepted)
+            if ok:
+                complete.append(completed)
+            else:
+                errors += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+    return {"accept": summarize(accept, elapsed), "complete": summarize(complete, elapsed, errors),
+            "elapsed_s": round(elapsed, 2)}
+
+async def bench_execute(args, payloads):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=120.0) as client:
+            return await run_execute(client, payloads, args.concurrency)
+
+    import terminator_agent as agent
+    driver = agent.get_driver()
+    driver.launch_latency = args.launch_latency
+    driver.char_latency = args.char_latency
+    transport = httpx.ASGITransport(app=agent.app)
+    # ASGITransport does not send lifespan events; run startup/shutdown ourselves
+    async with agent.app.router.lifespan_context(agent.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+            return await run_execute(client, payloads, args.concurrency)
+
+
+# --- VAPI Integration ---
+VAPI_PAYLOADS = [
+    {"summary": "User wants to open Notepad", "structuredData": {"appName": "notepad", "searchQuery": None}},
+    {"summary": "User wants to search for cat videos", "structuredData": {"appName": None, "searchQuery": "cute cat videos"}},
+    {"summary": "User wants to go to GitHub", "structuredData": {"appName": None, "searchQuery": "https://github.com"}},
+]
+
+def bench_vapi(count, concurrency, client_latency):
+    from terminator_drivers import SimulatedTerminatorClient
+    from vapi_terminator_client import TerminatorClientPool
+    with contextlib.redirect_stdout(io.StringIO()):
+        import vapi_terminator_integration as vapi
+    client = SimulatedTerminatorClient(latency=client_latency)
+    vapi.terminator_pool = TerminatorClientPool(factory=lambda: client, size=concurrency, probe=None)
+
+    def timed(payload):
+        started = time.monotonic()
+        vapi.process_vapi_data(payload)
+        return time.monotonic() - started
+
+    payloads = list(itertools.islice(itertools.cycle(VAPI_PAYLOADS), count))
+    started = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()): # process_vapi_data prints every step
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, payloads))
+    elapsed = time.monotonic() - started
+    return {**summarize(samples, elapsed), "elapsed_s": round(elapsed, 2),
+            "client_calls": len(client.calls)}
+
+
+# --- Cold Start ---
+async def probe_startup():
+    """Runs in a fresh interpreter: imports the agent, starts it and serves one request."""
+    import terminator_agent as agent
+    transport = httpx.ASGITransport(app=agent.app)
+    async with agent.app.router.lifespan_context(agent.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get("/")
+            first_response_ms = round((time.perf_counter() - agent.IMPORT_STARTED) * 1000, 1)
+            response.raise_for_status()
+    return {**agent.startup_report, "first_response_ms": first_response_ms}
+
+def bench_startup(runs):
+    """Median/max cold start timings over fresh interpreters, lazy vs. warmup."""
+    report = {}
+    for mode, warmup in (("lazy", "0"), ("warmup", "1")):
+        env = dict(os.environ, TERMINATOR_WARMUP=warmup)
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-probe"], env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            sample = json.loads(output.strip().splitlines()[-1])
+            sample["process_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            samples.append(sample)
+        report[mode] = {key: {"p50_ms": statistics.median(s[key] for s in samples),
+                              "max_ms": max(s[key] for s in samples)}
+                        for key in ("import_ms", "ready_ms", "first_response_ms", "process_ms")}
+        report[mode]["warmup_steps"] = samples[-1]["warmup"]
+    return report
+
+def print_startup_report(report, runs):
+    print(f"Terminator cold start ({runs} fresh interpreters per mode)")
+    print(f"{'':<8}{'import ms':>11}{'ready ms':>11}{'1st resp ms':>13}{'process ms':>12}   (p50 / max)")
+    for mode, row in report.items():
+        cells = [f"{row[key]['p50_ms']:.0f}/{row[key]['max_ms']:.0f}"
+                 for key in ("import_ms", "ready_ms", "first_response_ms", "process_ms")]
+        print(f"{mode:<8}{cells[0]:>11}{cells[1]:>11}{cells[2]:>13}{cells[3]:>12}")
+        if row["warmup_steps"]:
+            print(f"{'':<8}warmup steps (ms): {row['warmup_steps']}")
+
+
+# --- Reporting ---
+def print_report(report):
+    print(f"Terminator benchmark ({report['target']})")
+    rows = [("execute accept", report["execute"]["accept"]),
+            ("execute complete", report["execute"]["complete"])]
+    if "vapi" in report:
+        rows.append(("vapi dispatch", report["vapi"]))
+    print(f"{'':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, row in rows:
+        print(f"{label:<18}{row['requests']:>9}{row['errors']:>8}{row['throughput_rps'] or 0:>9}"
+              f"{row['p50_ms'] or 0:>10}{row['p99_ms'] or 0:>10}{row['max_ms'] or 0:>10}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load benchmark for the Terminator Agent.")
+    parser.add_argument("--url", help="Benchmark a running agent instead of an in-process simulated one.")
+    parser.add_argument("--requests", type=int, default=100, help="Number of /execute commands.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients.")
+    parser.add_argument("--apps", default=DEFAULT_APPS, help="Comma-separated app aliases to cycle through.")
+    parser.add_argument("--text-size", type=int, default=400, help="Characters typed per command (0: launch only).")
+    parser.add_argument("--typing-mode", default="auto", choices=["auto", "human", "bulk"])
+    parser.add_argument("--reuse", action="store_true", help="Send reuse_instance=true.")
+    parser.add_argument("--launch-latency", type=float, default=0.3, help="Simulated seconds until a window shows up.")
+    parser.add_argument("--char-latency", type=float, default=0.0005, help="Simulated seconds per typed character.")
+    parser.add_argument("--vapi-requests", type=int, default=100, help="process_vapi_data calls (0 to skip).")
+    parser.add_argument("--vapi-latency", type=float, default=0.05, help="Simulated Terminator client latency.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--fail-p99-ms", type=float, help="Exit 1 if the execute completion p99 exceeds this.")
+    parser.add_argument("--startup", type=int, metavar="RUNS", help="Only measure cold start over RUNS fresh interpreters.")
+    parser.add_argument("--startup-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.startup_probe:
+        print(json.dumps(asyncio.run(probe_startup())))
+        return 0
+    if args.startup:
+        report = bench_startup(args.startup)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_startup_report(report, args.startup)
+        return 0
+
+    apps = [app.strip() for app in args.apps.split(",") if app.strip()]
+    payloads = make_payloads(args.requests, apps, args.text_size, args.typing_mode, args.reuse)
+    report = {"target": args.url or "in-process, simulated driver",
+              "execute": asyncio.run(bench_execute(args, payloads))}
+    if args.vapi_requests > 0:
+        report["vapi"] = bench_vapi(args.vapi_requests, args.concurrency, args.vapi_latency)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    p99 = report["execute"]["complete"]["p99_ms"]
+    if args.fail_p99_ms is not None and (p99 is None or p99 > args.fail_p99_ms):
+        print(f"FAIL: execute completion p99 {p99} ms exceeds {args.fail_p99_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Browser launches for the Terminator Agent.
+
+Opening a URL used to spawn a brand-new `[chrome_path, url]` process per URL.
+Chromium browsers and Firefox accept several URLs on one command line and,
+when the browser is already running, hand them to that instance as new tabs
+and exit right away. The BrowserLauncher builds on that: one invocation per
+group of URLs, and URLs that arrive within BATCH_WINDOW of each other (e.g. a
+voice flow opening 5-10 research links) are coalesced into a single launch.
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from urllib.parse import quote_plus
+
+# --- Browser Settings ---
+# How long the first URL of a batch waits for more to arrive (0 disables batching)
+BATCH_WINDOW = float(os.environ.get("TERMINATOR_BROWSER_BATCH_MS", "150")) / 1000
+# Keeps one command line well below the Windows limit
+MAX_URLS_PER_LAUNCH = 20
+SEARCH_URL = "https://www.google.com/search?q={query}"
+URL_RE = re.compile(r"https?://\S+", re.IGNORECASE)
+# Separators allowed between URLs in one action text
+URL_SEPARATOR_RE = re.compile(r"[\s,;]+")
+
+# Browser alias -> arguments placed before each URL. Without --new-window,
+# Chromium browsers open the URLs as tabs of the running window.
+BROWSER_URL_ARGS = {
+    "chrome": [],
+    "edge": [],
+    "firefox": ["-new-tab"],
+}
+
+LaunchResult = namedtuple("LaunchResult", ["instance", "urls", "batch_size"])
+
+
+def search_url(query):
+    """Search URL for a free-text query, correctly URL-encoded (&, #, +, unicode...)."""
+    return SEARCH_URL.format(query=quote_plus(query.strip()))
+
+def url_list(text):
+    """The URLs in text if it consists only of http(s) URLs, else None."""
+    if not text:
+        return None
+    tokens = [token for token in URL_SEPARATOR_RE.split(text.strip()) if token]
+    if not tokens or not all(URL_RE.fullmatch(token) for token in tokens):
+        return None
+    return list(dict.fromkeys(tokens)) # drop repeats, keep order
+
+def browser_command(executable, alias, urls):
+    """Command line that opens all urls in one invocation of the browser."""
+    command = [executable]
+    prefix = BROWSER_URL_ARGS.get(alias, [])
+    for url in urls:
+        command.extend(prefix)
+        command.append(url)
+    return command
+
+
+class _Batch:
+    __slots__ = ("urls", "futures")
+
+    def __init__(self):
+        self.urls = []
+        self.futures = []
+
+
+class BrowserLauncher:
+    """
+    Opens URLs with as few browser invocations as possible.
+
+    spawn(alias, command_line) starts the process and returns the tracked
+    instance (InstanceManager.launch in the agent).
+    """
+
+    def __init__(self, spawn, batch_window=BATCH_WINDOW, max_urls=MAX_URLS_PER_LAUNCH):
+        self.spawn = spawn
+        self.batch_window = batch_window
+        self.max_urls = max(1, max_urls)
+        self._lock = threading.Lock()
+        self._pending = {} # (alias, executable) -> _Batch collecting URLs
+        self._counters = {"launches": 0, "urls": 0, "batched_requests": 0}
+
+    def open(self, alias, executable, urls):
+        """
+        Queues urls for the next launch of this browser and returns a Future
+        of a LaunchResult. The launch happens once batch_window has passed
+        since the first queued URL, or as soon as max_urls are waiting.
+        """
+        future = Future()
+        key = (alias, executable)
+        flush_now = None
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _Batch()
+                if self.batch_window > 0:
+                    timer = threading.Timer(self.batch_window, self._flush, args=(key, batch))
+                    timer.daemon = True
+                    timer.start()
+            batch.urls.extend(url for url in urls if url not in batch.urls)
+            batch.futures.append(future)
+            if self.batch_window <= 0 or len(batch.urls) >= self.max_urls:
+                flush_now = batch
+        if flush_now is not None:
+            self._flush(key, flush_now)
+        return future
+
+    def _flush(self, key, batch):
+        with self._lock:
+            if self._pending.get(key) is not batch:
+                return # already launched (size cap reached before the timer fired)
+            del self._pending[key]
+        alias, executable = key
+        try:
+            instance = None
+            for start in range(0, len(batch.urls), self.max_urls):
+                instance = self.spawn(alias, browser_command(executable, alias, batch.urls[start:start + self.max_urls]))
+                with self._lock:
+                    self._counters["launches"] += 1
+        except Exception as e:
+            for future in batch.futures:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self._counters["urls"] += len(batch.urls)
+            self._counters["batched_requests"] += len(batch.futures)
+        result = LaunchResult(instance, list(batch.urls), len(batch.futures))
+        for future in batch.futures:
+            future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {"batch_window_ms": round(self.batch_window * 1000), "pending": len(self._pending),
+                    **self._counters}
@@ -0,0 +1,432 @@
+"""
+Desktop drivers for the Terminator Agent.
+
+Everything the agent does to the desktop (spawning processes, enumerating and
+focusing windows, keystrokes, clipboard) goes through a DesktopDriver:
+
+- WindowsDriver: the real implementation on pyautogui, pygetwindow, pyperclip
+  and the Win32 API.
+- SimulatedDriver: an in-memory desktop with configurable launch, focus and
+  typing latencies, so the agent can be exercised and load-tested on any OS.
+
+Select one with TERMINATOR_DRIVER=windows|simulated (default: windows).
+"""
+import ctypes
+import functools
+import itertools
+import ntpath
+import os
+import random
+import subprocess
+import threading
+import time
+
+DRIVER_NAME = os.environ.get("TERMINATOR_DRIVER", "windows").lower()
+
+SW_SHOWMINNOACTIVE = 7 # start minimized without stealing focus
+
+
+class ClipboardError(Exception):
+    """The clipboard could not be read or written."""
+
+
+class DesktopDriver:
+    """Interface the agent uses for all desktop side effects."""
+
+    name = "base"
+    simulated = False
+
+    # --- Processes ---
+    def spawn(self, command_line, minimized=False):
+        """Starts a process; returns an object with pid, poll() and terminate()."""
+        raise NotImplementedError
+
+    def executable_index(self, app_map):
+        """Optional prebuilt {alias: executable} index; None means scan the real filesystem."""
+        return None
+
+    def preload(self):
+        """Loads whatever the driver would otherwise load on first use (see --warmup)."""
+
+    # --- Windows ---
+    def window_handles(self):
+        """Handles of all top-level windows (cheap: no titles are read)."""
+        raise NotImplementedError
+
+    def window_pid(self, hwnd):
+        raise NotImplementedError
+
+    def window(self, hwnd):
+        """Window object for a handle (title, isActive, activate(), restore(), ...)."""
+        raise NotImplementedError
+
+    def windows_with_title(self, title):
+        raise NotImplementedError
+
+    # --- Keyboard & Clipboard ---
+    def write(self, text, interval=0.0):
+        raise NotImplementedError
+
+    def hotkey(self, *keys):
+        raise NotImplementedError
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def clipboard_get(self):
+        raise NotImplementedError
+
+    def clipboard_set(self, text):
+        raise NotImplementedError
+
+
+# --- Windows Implementation ---
+class WindowsDriver(DesktopDriver):
+    """
+    Drives the real Windows desktop.
+
+    pyautogui, pygetwindow and pyperclip take a noticeable part of a second
+    to import, so each is imported the first time it is needed.
+    """
+
+    name = "windows"
+
+    @functools.cached_property
+    def _pyautogui(self):
+        import pyautogui
+        return pyautogui
+
+    @functools.cached_property
+    def _gw(self):
+        import pygetwindow
+        return pygetwindow
+
+    @functools.cached_property
+    def _pyperclip(self):
+        import pyperclip
+        return pyperclip
+
+    def preload(self):
+        self._pyautogui, self._gw, self._pyperclip
+
+    def spawn(self, command_line, minimized=False):
+        kwargs = {}
+        if minimized and hasattr(subprocess, "STARTUPINFO"):
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = SW_SHOWMINNOACTIVE
+            kwargs["startupinfo"] = startupinfo
+        return subprocess.Popen(command_line, **kwargs) # Popen handles list or string
+
+    def window_handles(self):
+        handles = []
+        enum_proc = ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p)
+
+        def collect(hwnd, _lparam):
+            handles.append(hwnd)
+            return True
+
+        ctypes.windll.user32.EnumWindows(enum_proc(collect), 0)
+        return handles
+
+    def window_pid(self, hwnd):
+        try:
+            pid = ctypes.c_ulong()
+            ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            return pid.value
+        except Exception:
+            return None
+
+    def window(self, hwnd):
+        return self._gw.Win32Window(hwnd)
+
+    def windows_with_title(self, title):
+        return self._gw.getWindowsWithTitle(title)
+
+    def write(self, text, interval=0.0):
+        # No trailing pyautogui.PAUSE: text is often written one key at a time
+        self._pyautogui.write(text, interval=interval, _pause=False)
+
+    def hotkey(self, *keys):
+        self._pyautogui.hotkey(*keys)
+
+    def press(self, key):
+        self._pyautogui.press(key)
+
+    def clipboard_get(self):
+        try:
+            return self._pyperclip.paste()
+        except self._pyperclip.PyperclipException as e:
+            raise ClipboardError(str(e)) from e
+
+    def clipboard_set(self, text):
+        try:
+            self._pyperclip.copy(text)
+        except self._pyperclip.PyperclipException as e:
+            raise ClipboardError(str(e)) from e
+
+
+# --- Simulated Implementation ---
+class SimProcess:
+    """Stand-in for subprocess.Popen."""
+
+    def __init__(self, pid, command_line):
+        self.pid = pid
+        self.args = command_line
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.returncode = -15
+
+
+class SimWindow:
+    """In-memory window exposing the pygetwindow attributes the agent uses."""
+
+    def __init__(self, desktop, hwnd, pid, title, ready_at, minimized=False):
+        self._desktop = desktop
+        self._hWnd = hwnd
+        self.pid = pid
+        self.title = title
+        self.ready_at = ready_at
+        self.isMinimized = minimized
+        self.visible = True
+        self.width = 800
+        self.height = 600
+        self.text = ""
+        self.saved = False
+
+    @property
+    def isActive(self):
+        return self._desktop.active_window is self
+
+    def activate(self):
+        self._desktop.focus(self)
+
+    def restore(self):
+        with self._desktop._lock:
+            self.isMinimized = False
+            self._desktop.bring_to_front(self) # restoring a window also activates it
+
+
+class SimulatedDriver(DesktopDriver):
+    """
+    An in-memory desktop for tests and benchmarks.
+
+    Latencies are real sleeps so throughput and percentiles are meaningful:
+    - launch_latency: seconds from spawn until the window is focusable,
+      either one number or {executable stem: seconds} (key "default" as fallback)
+    - focus_latency: seconds an activate() takes
+    - char_latency: seconds per typed character (used instead of the
+      caller's interval, so "human" typing can be sped up for load tests)
+    - paste_latency: seconds per Ctrl+V
+    - jitter: +/- fraction applied to every latency
+    Windows are titled from titles ({executable stem: title}). Like on a real
+    desktop, a window takes the foreground when it appears (unless started
+    minimized) or is restored; keys go to the window in front when write()
+    or hotkey() is called.
+    single_instance ({executable stem: "window" or "tab"}) models apps that
+    hand a relaunch to their running process, which then exits: "window"
+    opens the new window in the first process (Chrome, VS Code, Office),
+    "tab" opens no window at all (Notepad with tabs).
+    """
+
+    name = "simulated"
+    simulated = True
+
+    def __init__(self, launch_latency=0.3, focus_latency=0.02, char_latency=0.0005,
+                 paste_latency=0.01, jitter=0.1, titles=None, seed=None, single_instance=None):
+        self.launch_latency = launch_latency
+        self.focus_latency = focus_latency
+        self.char_latency = char_latency
+        self.paste_latency = paste_latency
+        self.jitter = jitter
+        self.titles = {k.lower(): v for k, v in (titles or {}).items()}
+        self.single_instance = {k.lower(): v for k, v in (single_instance or {}).items()}
+        self._first_pid = {} # executable stem -> pid of its first (single-instance) process
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._pids = itertools.count(1000)
+        self._hwnds = itertools.count(0x10000)
+        self._windows = {}
+        self._focus_history = []
+        self._shown = set() # hwnds whose appearance already took the foreground
+        self.active_hwnd = None
+        self.clipboard = ""
+        self.spawned = []
+
+    # --- Helpers ---
+    def _latency(self, value):
+        if self.jitter:
+            value *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, value)
+
+    def _launch_latency_for(self, stem):
+        if isinstance(self.launch_latency, dict):
+            return self.launch_latency.get(stem, self.launch_latency.get("default", 0.3))
+        return self.launch_latency
+
+    @property
+    def active_window(self):
+        with self._lock:
+            self._settle()
+            return self._windows.get(self.active_hwnd)
+
+    def bring_to_front(self, window):
+        with self._lock:
+            self.active_hwnd = window._hWnd
+            self._focus_history.append(window._hWnd)
+
+    def _settle(self):
+        """Windows that became visible since the last call take the foreground, newest last."""
+        now = time.monotonic()
+        appeared = [w for w in self._windows.values() if w.ready_at <= now and w._hWnd not in self._shown]
+        for window in sorted(appeared, key=lambda w: w.ready_at):
+            self._shown.add(window._hWnd)
+            if not window.isMinimized:
+                self.bring_to_front(window)
+
+    def focus(self, window):
+        time.sleep(self._latency(self.focus_latency))
+        with self._lock:
+            self._settle()
+            self.bring_to_front(window)
+
+    # --- Processes ---
+    def spawn(self, command_line, minimized=False):
+        program = command_line[0] if isinstance(command_line, (list, tuple)) else command_line
+        stem = ntpath.splitext(ntpath.basename(str(program)))[0].lower()
+        with self._lock:
+            process = SimProcess(next(self._pids), command_line)
+            self.spawned.append(process)
+            owner = process.pid
+            handoff = self.single_instance.get(stem)
+            first_pid = self._first_pid.get(stem)
+            if handoff and first_pid is not None and any(w.pid == first_pid for w in self._windows.values()):
+                process.returncode = 0 # handed the launch to the running instance
+                if handoff == "tab":
+                    return process
+                owner = first_pid
+            elif handoff:
+                self._first_pid[stem] = process.pid
+            hwnd = next(self._hwnds)
+            ready_at = time.monotonic() + self._latency(self._launch_latency_for(stem))
+            title = self.titles.get(stem, stem.title())
+            self._windows[hwnd] = SimWindow(self, hwnd, owner, title, ready_at, minimized=minimized)
+        return process
+
+    def executable_index(self, app_map):
+        # Every mapped app counts as installed; bare names get a fake System32 path
+        return {alias: path if ntpath.isabs(path) or "\\" in path else ntpath.join("C:\\Windows\\System32", path)
+                for alias, path in app_map.items()}
+
+    # --- Windows ---
+    def _visible_windows(self):
+        now = time.monotonic()
+        return [w for w in self._windows.values() if w.ready_at <= now]
+
+    def window_handles(self):
+        with self._lock:
+            return [w._hWnd for w in self._visible_windows()]
+
+    def window_pid(self, hwnd):
+        with self._lock:
+            window = self._windows.get(hwnd)
+            return window.pid if window else None
+
+    def window(self, hwnd):
+        with self._lock:
+            return self._windows[hwnd]
+
+    def windows_with_title(self, title):
+        with self._lock:
+            return [w for w in self._visible_windows() if title in w.title]
+
+    # --- Keyboard & Clipboard ---
+    def write(self, text, interval=0.0):
+        with self._lock:
+            self._settle()
+            window = self._windows.get(self.active_hwnd)
+            if window is not None:
+                window.text += text
+        time.sleep(self._latency(self.char_latency * len(text)))
+
+    def hotkey(self, *keys):
+        combo = tuple(key.lower() for key in keys)
+        if combo == ("ctrl", "v"):
+            time.sleep(self._latency(self.paste_latency))
+        with self._lock:
+            self._settle()
+            window = self._windows.get(self.active_hwnd)
+            if combo == ("ctrl", "v"):
+                if window is not None:
+                    window.text += self.clipboard
+            elif combo == ("ctrl", "s"):
+                if window is not None:
+                    window.saved = True
+            elif combo == ("alt", "tab"):
+                previous = [h for h in self._focus_history if h != self.active_hwnd and h in self._windows]
+                if previous:
+                    self.active_hwnd = previous[-1]
+                    self._focus_history.append(self.active_hwnd)
+
+    def press(self, key):
+        pass
+
+    def clipboard_get(self):
+        with self._lock:
+            return self.clipboard
+
+    def clipboard_set(self, text):
+        with self._lock:
+            self.clipboard = text
+
+
+class SimulatedTerminatorClient:
+    """Stand-in for desktop_use.DesktopUseClient with a fixed per-call latency."""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _call(self, action, argument):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls.append((action, argument))
+
+    def open_application(self, app_name):
+        self._call("open_application", app_name)
+
+    def open_url(self, url):
+        self._call("open_url", url)
+
+
+# --- Driver Selection ---
+_driver = None
+_driver_lock = threading.Lock()
+
+def create_driver(name=DRIVER_NAME, **options):
+    if name == "simulated":
+        return SimulatedDriver(**options)
+    if name == "windows":
+        return WindowsDriver()
+    raise ValueError(f"Unknown desktop driver '{name}' (expected 'windows' or 'simulated').")
+
+def get_driver():
+    """The active driver, created from TERMINATOR_DRIVER on first use."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = create_driver()
+    return _driver
+
+def set_driver(driver):
+    """Installs a driver explicitly (e.g. a configured SimulatedDriver in benchmarks)."""
+    global _driver
+    with _driver_lock:
+        _driver = driver
+    return driver
@@ -0,0 +1,95 @@
+"""
+Direct-to-disk saving of generated code for the Terminator Agent.
+
+Typing a code payload into an editor and driving its Save As dialog with
+Ctrl+S, fixed sleeps and Enter is slow and breaks when the dialog is late.
+Instead, the payload is written straight to an output directory under a
+unique name, with an extension picked from the detected language, and the
+editor is then launched on that file.
+"""
+import functools
+import json
+import os
+import re
+from collections import namedtuple
+from datetime import datetime
+
+# --- Output Settings ---
+OUTPUT_DIR = os.environ.get(
+    "TERMINATOR_OUTPUT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "generated_code"),
+)
+DEFAULT_STEM = "generated_code"
+MAX_NAME_ATTEMPTS = 1000
+
+SavedFile = namedtuple("SavedFile", ["path", "language", "extension"])
+
+# Checked in order; the language with the highest score wins and ties go to
+# the earlier entry. A pattern adds 1, or its weight when given as
+# (pattern, weight): strong signatures weigh MIN_SCORE so they decide alone.
+MIN_SCORE = 2
+LANGUAGE_PATTERNS = [
+    ("python", ".py", [(r"^\s*def \w+\(.*\):", 2), r"^\s*(from \w[\w.]* )?import \w", (r"^\s*print\(.*\)\s*$", 2),
+                       (r"^\s*class \w+(\(.*\))?:", 2), r"\bself\b"]),
+    ("typescript", ".ts", [r"\binterface \w+ \{", r":\s*(string|number|boolean)\b", r"\bexport (type|interface)\b"]),
+    ("javascript", ".js", [r"\bfunction\b", r"\b(const|let|var) \w+ =", r"=>", r"\bconsole\.log\(", r"\brequire\("]),
+    ("html", ".html", [r"<!DOCTYPE html", r"<html\b", r"<(div|body|head|script|p)\b"]),
+    ("css", ".css", [r"^\s*[.#]?[\w-]+\s*\{", r"^\s*[\w-]+:\s*[^;]+;\s*$"]),
+    ("java", ".java", [r"\bpublic (static )?(class|void)\b", r"\bSystem\.out\.print", r"\bString\[\] args\b"]),
+    ("csharp", ".cs", [r"^\s*using System", r"\bnamespace \w+", r"\bConsole\.Write"]),
+    ("cpp", ".cpp", [(r"#include\s*<\w+>", 2), (r"\bstd::", 2), r"\bint main\(", r"\bcout\b"]),
+    ("c", ".c", [(r"#include\s*<[\w./]+>", 2), r"\bprintf\(", r"\bint main\("]),
+    ("sql", ".sql", [r"(?i)\bSELECT\b.+\bFROM\b", r"(?i)\b(INSERT INTO|CREATE TABLE|UPDATE \w+ SET)\b"]),
+    ("shell", ".sh", [r"^#!/bin/(ba)?sh", r"^\s*echo ", r"\$\{?\w+\}?"]),
+    ("powershell", ".ps1", [r"\bWrite-Host\b", r"\$\w+\s*=", r"\bGet-\w+"]),
+]
+
+@functools.lru_cache(maxsize=None)
+def compiled_patterns():
+    """LANGUAGE_PATTERNS compiled on first use rather than at import time."""
+    compiled = []
+    for language, extension, patterns in LANGUAGE_PATTERNS:
+        weighted = [pattern if isinstance(pattern, tuple) else (pattern, 1) for pattern in patterns]
+        compiled.append((language, extension, [(re.compile(p, re.MULTILINE), weight) for p, weight in weighted]))
+    return compiled
+
+
+def detect_language(text):
+    """Returns (language, extension) for a code payload, ('text', '.txt') if unsure."""
+    stripped = text.strip()
+    if stripped[:1] in "{[":
+        try:
+            json.loads(stripped)
+            return "json", ".json"
+        except ValueError:
+            pass
+    best, best_score = ("text", ".txt"), 0
+    for language, extension, patterns in compiled_patterns():
+        score = sum(weight for pattern, weight in patterns if pattern.search(text))
+        # A single incidental match (e.g. a '$' or '=>') is not enough
+        if score >= MIN_SCORE and score > best_score:
+            best, best_score = (language, extension), score
+    return best
+
+def unique_path(directory, stem, extension):
+    """Creates and returns a new empty file named stem_<timestamp>[_n]<ext> in directory."""
+    os.makedirs(directory, exist_ok=True)
+    base = f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    for attempt in range(1, MAX_NAME_ATTEMPTS + 1):
+        name = f"{base}{extension}" if attempt == 1 else f"{base}_{attempt}{extension}"
+        path = os.path.join(directory, name)
+        try:
+            # 'x' fails if the file exists, so concurrent saves never share a name
+            with open(path, "x", encoding="utf-8"):
+                return path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No free file name for '{base}{extension}' in '{directory}'.")
+
+def save_code(text, directory=None, stem=DEFAULT_STEM):
+    """Writes text to a uniquely named file and returns a SavedFile."""
+    language, extension = detect_language(text)
+    path = unique_path(directory or OUTPUT_DIR, stem, extension)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return SavedFile(os.path.abspath(path), language, extension)
@@ -0,0 +1,107 @@
+"""
+Idempotency and request coalescing for the Terminator Agent.
+
+Voice pipelines retry and double-fire, so the same command can arrive twice
+within a second. Commands are keyed either by a client-supplied idempotency
+key or by a fingerprint of their payload; a duplicate that arrives while the
+first job is still queued/running, or shortly after it succeeded, is handed
+the original job instead of executing again.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# --- Idempotency Settings ---
+# How long a finished job answers for an explicit idempotency key
+KEY_TTL = float(os.environ.get("TERMINATOR_IDEMPOTENCY_TTL", "60"))
+# How long a finished job absorbs identical payloads sent without a key (0 disables)
+DEDUPE_WINDOW = float(os.environ.get("TERMINATOR_DEDUPE_WINDOW", "2"))
+MAX_ENTRIES = int(os.environ.get("TERMINATOR_IDEMPOTENCY_ENTRIES", "1024"))
+
+Admission = namedtuple("Admission", ["job", "reused", "reason"])
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused with a different payload."""
+
+
+def fingerprint(payload):
+    """Stable hash of a JSON-serializable command payload."""
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("job", "fingerprint", "ttl")
+
+    def __init__(self, job, fingerprint, ttl):
+        self.job = job
+        self.fingerprint = fingerprint
+        self.ttl = ttl
+
+    def live(self, now):
+        job = self.job
+        if not job.finished:
+            return True
+        # Failures are not cached, so a retry actually retries
+        return job.error is None and now < job.finished_at + self.ttl
+
+
+class IdempotencyCache:
+    """Bounded LRU of key -> job with a per-entry TTL counted from job completion."""
+
+    def __init__(self, key_ttl=KEY_TTL, dedupe_window=DEDUPE_WINDOW, max_entries=MAX_ENTRIES):
+        self.key_ttl = key_ttl
+        self.dedupe_window = dedupe_window
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def submit(self, payload, submit, key=None):
+        """
+        Returns an Admission for payload, calling submit() only if no live
+        job already answers for it.
+
+        With a key, the key identifies the command and reusing it for a
+        different payload raises IdempotencyConflict. Without one, identical
+        payloads are coalesced within the dedupe window.
+        """
+        digest = fingerprint(payload)
+        if key is not None:
+            cache_key, ttl = ("key", key), self.key_ttl
+        elif self.dedupe_window > 0:
+            cache_key, ttl = ("payload", digest), self.dedupe_window
+        else:
+            return Admission(submit(), False, None)
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry.live(now):
+                if entry.fingerprint != digest:
+                    raise IdempotencyConflict(f"Idempotency key '{key}' was already used for a different command.")
+                self._entries.move_to_end(cache_key)
+                return Admission(entry.job, True, "in_flight" if not entry.job.finished else "cached")
+            # Submitting under the lock makes concurrent duplicates wait for
+            # the first one to be queued; submit() itself never blocks long.
+            job = submit()
+            self._entries[cache_key] = _Entry(job, digest, ttl)
+            self._entries.move_to_end(cache_key)
+            self._evict(now)
+        return Admission(job, False, None)
+
+    def _evict(self, now):
+        # Caller holds self._lock: drop expired entries from the LRU end, then enforce the size cap
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.live(now) and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "key_ttl": self.key_ttl, "dedupe_window": self.dedupe_window}
@@ -0,0 +1,144 @@
+"""
+Text injection strategies for the Terminator Agent.
+
+Per-character typing presses one key per character, which takes around 100 s for
+a 2 KB code snippet. The bulk strategy pastes the text through the clipboard
+instead (saving and restoring whatever the user had copied), splitting huge
+payloads into chunks so the target editor keeps up.
+
+Another app's window can take the foreground at any time (a launch finishing
+on another worker, a restored instance), so callers may pass a focus
+callback that is run before every key press or paste to put the target
+window back in front.
+"""
+import os
+import random
+import time
+
+from terminator_drivers import ClipboardError, get_driver
+from terminator_logging import console
+
+# --- Injection Modes ---
+TYPING_MODE_AUTO = "auto"   # bulk for long text, human-like for short text
+TYPING_MODE_HUMAN = "human" # per-character typing with a random interval
+TYPING_MODE_BULK = "bulk"   # clipboard paste
+
+# Texts up to this many characters keep the human-like path in auto mode.
+BULK_THRESHOLD = int(os.environ.get("TERMINATOR_BULK_THRESHOLD", "200"))
+# Largest piece pasted at once; bigger payloads are pasted chunk by chunk.
+BULK_CHUNK_SIZE = int(os.environ.get("TERMINATOR_BULK_CHUNK_SIZE", "16384"))
+# Time for the target app to read the clipboard after Ctrl+V, before the
+# clipboard is overwritten by the next chunk or restored: a base plus a share
+# per KB, since a busy editor takes longer to take in a bigger paste.
+PASTE_SETTLE_SECONDS = 0.05
+PASTE_SETTLE_PER_KB = 0.01
+# Per-character typing is split into this many pieces so progress can be reported.
+PROGRESS_STEPS = 20
+
+
+class PasteInterrupted(ClipboardError):
+    """The clipboard failed after the first pasted characters were already in the window."""
+
+    def __init__(self, message, pasted):
+        super().__init__(message)
+        self.pasted = pasted
+
+
+def paste_settle_seconds(chunk):
+    return PASTE_SETTLE_SECONDS + PASTE_SETTLE_PER_KB * len(chunk) / 1024
+
+def resolve_mode(text, mode=TYPING_MODE_AUTO):
+    """Picks the concrete strategy for text when mode is auto."""
+    if mode == TYPING_MODE_AUTO:
+        return TYPING_MODE_BULK if len(text) > BULK_THRESHOLD else TYPING_MODE_HUMAN
+    return mode
+
+def type_human(text, progress=None, focus=None):
+    """
+    Types text key by key like the original agent did.
+
+    progress, if given, is called as progress(chars_done, total) after each piece.
+    focus, if given, is called before each key.
+    """
+    interval = random.uniform(0.03, 0.07)
+    driver = get_driver()
+    if progress is None and focus is None:
+        driver.write(text, interval=interval)
+        return {"mode": TYPING_MODE_HUMAN, "interval": round(interval, 3)}
+    step = max(1, -(-len(text) // PROGRESS_STEPS))
+    piece = 1 if focus is not None else step
+    reported = 0
+    for start in range(0, len(text), piece):
+        if focus is not None:
+            focus()
+        driver.write(text[start:start + piece], interval=interval)
+        done = min(start + piece, len(text))
+        if progress is not None and (done - reported >= step or done == len(text)):
+            progress(done, len(text))
+            reported = done
+    return {"mode": TYPING_MODE_HUMAN, "interval": round(interval, 3)}
+
+def paste_bulk(text, chunk_size=BULK_CHUNK_SIZE, progress=None, focus=None):
+    """
+    Pastes text via the clipboard and restores the previous clipboard content.
+
+    progress, if given, is called as progress(chars_done, total) after each chunk.
+    focus, if given, is called before each Ctrl+V.
+
+    Raises ClipboardError if the clipboard is unavailable, or PasteInterrupted
+    (with the number of characters already pasted) if it fails midway.
+    """
+    driver = get_driver()
+    try:
+        saved_clipboard = driver.clipboard_get()
+    except ClipboardError:
+        saved_clipboard = None
+
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+    try:
+        done = 0
+        for chunk in chunks:
+            try:
+                driver.clipboard_set(chunk)
+            except ClipboardError as e:
+                if done:
+                    raise PasteInterrupted(str(e), done) from e
+                raise
+            if focus is not None:
+                focus()
+            driver.hotkey('ctrl', 'v')
+            time.sleep(paste_settle_seconds(chunk))
+            done += len(chunk)
+            if progress is not None:
+                progress(done, len(text))
+    finally:
+        if saved_clipboard is not None:
+            try:
+                driver.clipboard_set(saved_clipboard)
+            except ClipboardError as e:
+                console(f"Warning: Could not restore clipboard: {e}")
+    return {"mode": TYPING_MODE_BULK, "chunks": len(chunks)}
+
+def inject_text(text, mode=TYPING_MODE_AUTO, progress=None, focus=None):
+    """
+    Injects text into the focused window with the requested strategy.
+
+    Returns a dict describing what was done. Bulk injection falls back to
+    human-like typing if the clipboard cannot be used; only the part that was
+    not pasted yet is typed. focus, if given, is called before every key
+    press or paste (see the module docstring).
+    """
+    mode = resolve_mode(text, mode)
+    if mode == TYPING_MODE_BULK:
+        try:
+            return paste_bulk(text, progress=progress, focus=focus)
+        except PasteInterrupted as e:
+            console(f"Clipboard failed after {e.pasted} characters ({e}). Typing the rest per character.")
+            rest_progress = None
+            if progress is not None:
+                rest_progress = lambda done, _total: progress(e.pasted + done, len(text))
+            result = type_human(text[e.pasted:], progress=rest_progress, focus=focus)
+            return {**result, "pasted_chars": e.pasted}
+        except ClipboardError as e:
+            console(f"Clipboard unavailable ({e}). Falling back to per-character typing.")
+    return type_human(text, progress=progress, focus=focus)
@@ -0,0 +1,161 @@
+"""
+Application instance management for the Terminator Agent.
+
+Tracks the processes the agent launches so a request can reuse a running
+instance instead of spawning a duplicate, and optionally keeps a warm pool of
+pre-launched heavy apps (Word, Excel, VS Code, ...) so their cold start is
+paid before a command needs them. Instances whose process has exited are
+reaped periodically.
+"""
+import os
+import threading
+import time
+
+from terminator_drivers import get_driver
+from terminator_logging import console
+from terminator_windows import restore_windows, window_registry
+
+# --- Instance Settings ---
+# Aliases to pre-launch at startup, e.g. TERMINATOR_WARM_POOL="word,excel,vscode"
+WARM_POOL_ALIASES = [a.strip().lower() for a in os.environ.get("TERMINATOR_WARM_POOL", "").split(",") if a.strip()]
+REAP_INTERVAL = 30.0 # seconds between background sweeps for exited processes
+
+
+class AppInstance:
+    """A process launched by the agent."""
+
+    def __init__(self, alias, process, warm=False):
+        self.alias = alias
+        self.process = process
+        self.pid = process.pid
+        self.warm = warm # pre-launched and not yet handed to a request
+        self.origin = "launched" # how the last request got it: launched, warm or running
+        self.launched_at = time.time()
+        self.last_used = None if warm else self.launched_at
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def to_dict(self):
+        return {"alias": self.alias, "pid": self.pid, "warm": self.warm, "origin": self.origin,
+                "launched_at": self.launched_at, "last_used": self.last_used}
+
+
+class InstanceManager:
+    """Launches, reuses, pre-warms and reaps app processes."""
+
+    def __init__(self, reap_interval=REAP_INTERVAL):
+        self.reap_interval = reap_interval
+        self._lock = threading.Lock()
+        self._instances = {}  # pid -> AppInstance
+        self._warm_targets = {} # alias -> executable to keep one warm instance of
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Launching ---
+    def launch(self, alias, command_line, warm=False):
+        """Spawns command_line and starts tracking it. Raises like subprocess.Popen."""
+        process = get_driver().spawn(command_line, minimized=warm) # warm instances start minimized
+        instance = AppInstance(alias, process, warm=warm)
+        window_registry.track(instance.pid, alias)
+        with self._lock:
+            self._instances[instance.pid] = instance
+        return instance
+
+    def acquire(self, alias, reuse_running=False):
+        """
+        Returns an existing instance for alias, or None if a new one must be launched.
+
+        A warm instance is always preferred, since it is equivalent to a fresh
+        launch. Running instances that already served a request are only
+        reused when reuse_running is set.
+        """
+        self.reap()
+        with self._lock:
+            candidates = [i for i in self._instances.values() if i.alias == alias and i.alive]
+            instance = next((i for i in candidates if i.warm), None)
+            origin = "warm"
+            if instance is None and reuse_running:
+                running = [i for i in candidates if window_registry.handles_for_pid(i.pid)]
+                instance = max(running, key=lambda i: i.last_used or 0, default=None)
+                origin = "running"
+            if instance is not None:
+                instance.origin = origin
+                instance.warm = False
+                instance.last_used = time.time()
+        if instance is None:
+            return None
+        restore_windows(instance.pid)
+        if alias in self._warm_targets:
+            # Keep the pool topped up without delaying this request
+            threading.Thread(target=self._launch_warm, args=(alias,), daemon=True).start()
+        return instance
+
+    # --- Warm Pool ---
+    def start_warm_pool(self, targets):
+        """Pre-launches one instance per alias in targets ({alias: executable})."""
+        self._warm_targets = dict(targets)
+        threads = [threading.Thread(target=self._launch_warm, args=(alias,), daemon=True) for alias in targets]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _launch_warm(self, alias):
+        with self._lock:
+            if any(i.alias == alias and i.warm and i.alive for i in self._instances.values()):
+                return
+        try:
+            instance = self.launch(alias, self._warm_targets[alias], warm=True)
+            console(f"Warm pool: pre-launched '{alias}' (PID: {instance.pid})")
+        except Exception as e:
+            console(f"Warm pool: could not pre-launch '{alias}': {e}")
+
+    # --- Reaping ---
+    def reap(self):
+        """Drops instances whose process has exited. Returns how many were removed."""
+        with self._lock:
+            dead = [pid for pid, instance in self._instances.items() if not instance.alive]
+            for pid in dead:
+                del self._instances[pid]
+        for pid in dead:
+            window_registry.untrack(pid)
+        return len(dead)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._reap_loop, name="terminator-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, close_warm=True):
+        """Stops the reaper and closes warm instances no request has claimed."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if close_warm:
+            with self._lock:
+                unclaimed = [i for i in self._instances.values() if i.warm and i.alive]
+            for instance in unclaimed:
+                try:
+                    instance.process.terminate()
+                except Exception as e:
+                    console(f"Could not close warm '{instance.alias}' (PID: {instance.pid}): {e}")
+
+    def _reap_loop(self):
+        while not self._stop.wait(self.reap_interval):
+            try:
+                removed = self.reap()
+                if removed:
+                    console(f"Reaped {removed} exited app instance(s).")
+            except Exception as e:
+                console(f"Instance reaper failed: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "warm_pool": sorted(self._warm_targets),
+                "instances": [instance.to_dict() for instance in self._instances.values()],
+            }
@@ -0,0 +1,341 @@
+"""
+Background job engine for the Terminator Agent.
+
+Desktop work (Popen, window waits, typing) is blocking, so it runs on
+dedicated worker threads instead of the uvicorn event loop. Jobs are grouped
+into lanes by target window: jobs in the same lane run strictly one after
+another, while different lanes can run in parallel on separate workers.
+
+While a job runs, code on the worker can report progress with emit(); the
+events are kept on the job so clients can stream them (see Job.wait_events).
+Async handlers use wait_events_async/wait_done_async, which park a future on
+their event loop instead of a thread of the default executor, so open
+streams and long polls cost no threads.
+
+Admission is bounded: once max_pending jobs are waiting, submit() raises
+QueueFull with a Retry-After estimate. Interactive jobs (voice commands) are
+scheduled ahead of bulk work and keep a reserved share of the queue.
+"""
+import asyncio
+import contextvars
+import itertools
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from terminator_logging import log_context
+from terminator_metrics import metrics
+
+# --- Job States ---
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# --- Priorities (lower runs first) ---
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+_PRIORITY_STOP = 99 # worker shutdown sentinel, after all queued work
+
+# Cap on progress events kept per job; terminal events are always recorded
+MAX_JOB_EVENTS = 200
+
+_current_job = contextvars.ContextVar("terminator_current_job", default=None)
+
+metrics.describe("queue_wait_seconds", "Time commands spent queued before a worker picked them up, by priority.")
+metrics.describe("admission_rejected_total", "Commands rejected with 429 because the queue was full, by priority.")
+
+
+class QueueFull(Exception):
+    """The admission queue has no room; retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    """A single unit of desktop work and its outcome."""
+
+    def __init__(self, target, func, args, description="", log_fields=None, priority=PRIORITY_INTERACTIVE):
+        self.id = uuid.uuid4().hex
+        self.target = target
+        self.priority = priority
+        self.description = description
+        self.log_fields = log_fields or {}
+        self.func = func
+        self.args = args
+        self.state = JOB_QUEUED
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+        self.events = []
+        self._events_changed = threading.Condition()
+        self._async_waiters = [] # (loop, future) of async waits, woken by add_event
+
+    @property
+    def finished(self):
+        return self.state in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def add_event(self, event, **data):
+        """Records a progress event and wakes up anyone streaming this job."""
+        with self._events_changed:
+            if len(self.events) >= MAX_JOB_EVENTS and event not in ("done", "error"):
+                return
+            self.events.append({"seq": len(self.events), "event": event, "ts": time.time(), **data})
+            self._events_changed.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                pass # that event loop is closed
+
+    def wait_events(self, after, timeout=None):
+        """
+        Events with seq >= after, waiting up to timeout for one to arrive.
+
+        Returns an empty list on timeout. The last event of a job is always
+        'done' or 'error'.
+        """
+        with self._events_changed:
+            if len(self.events) <= after:
+                self._events_changed.wait(timeout)
+            return self.events[after:]
+
+    async def wait_events_async(self, after, timeout=None):
+        """wait_events() for async code: waits on the running event loop, not on a thread."""
+        loop = asyncio.get_running_loop()
+        with self._events_changed:
+            if len(self.events) > after:
+                return self.events[after:]
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._events_changed:
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+        with self._events_changed:
+            return self.events[after:]
+
+    async def wait_done_async(self, timeout=None):
+        """Waits on the running event loop until the job finished. Returns job.finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.finished:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            await self.wait_events_async(len(self.events), remaining)
+        return self.finished
+
+    def to_dict(self):
+        """Serializable view of the job for the /jobs endpoints."""
+        return {
+            "job_id": self.id,
+            "state": self.state,
+            "target": self.target,
+            "priority": PRIORITY_NAMES.get(self.priority, self.priority),
+            "description": self.description,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "status_code": self.status_code,
+        }
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class JobEngine:
+    """
+    Runs submitted jobs on a fixed pool of worker threads.
+
+    Each target has its own FIFO lane. A lane is handed to at most one worker
+    at a time, which serializes all work against the same window while still
+    letting unrelated targets proceed concurrently. Ready lanes are picked by
+    the priority of their next job, so interactive work overtakes bulk work
+    queued for other windows.
+
+    At most max_pending jobs wait at once; bulk jobs are only admitted while
+    interactive_reserve of those slots are still free.
+    """
+
+    def __init__(self, workers=2, max_finished=500, max_pending=100, interactive_reserve=None):
+        self.workers = max(1, workers)
+        self.max_finished = max_finished
+        self.max_pending = max(1, max_pending)
+        if interactive_reserve is None:
+            interactive_reserve = self.max_pending // 5
+        self.interactive_reserve = min(max(0, interactive_reserve), self.max_pending - 1)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._lanes = {}           # target -> deque of pending jobs
+        self._active_lanes = set() # targets currently owned by a worker
+        self._ready = queue.PriorityQueue() # (priority, seq, target) for lanes with work and no owner
+        self._seq = itertools.count()
+        self._pending = {priority: 0 for priority in PRIORITY_NAMES}
+        self._avg_run_seconds = None # moving average used for Retry-After
+        self._threads = []
+        self._running = False
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"terminator-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        if not self._running:
+            return
+        self._running = False
+        for _ in self._threads:
+            self._ready.put((_PRIORITY_STOP, next(self._seq), None))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # --- Public API ---
+    def submit(self, target, func, *args, description="", log_fields=None, priority=PRIORITY_INTERACTIVE):
+        """
+        Queues func(*args) on the lane for target and returns the Job.
+
+        Raises QueueFull if the job cannot be admitted. Records logged while
+        the job runs carry its id as request_id, plus log_fields.
+        """
+        job = Job(target, func, args, description=description, log_fields=log_fields, priority=priority)
+        with self._lock:
+            self._admit(priority, 1)
+            self._jobs[job.id] = job
+            self._pending[priority] = self._pending.get(priority, 0) + 1
+            self._lanes.setdefault(target, deque()).append(job)
+            if target not in self._active_lanes:
+                self._active_lanes.add(target)
+                self._ready.put((priority, next(self._seq), target))
+        job.add_event("queued", target=target, priority=PRIORITY_NAMES.get(priority, priority))
+        return job
+
+    def check_capacity(self, count, priority=PRIORITY_INTERACTIVE):
+        """Raises QueueFull unless count more jobs of this priority would be admitted right now."""
+        with self._lock:
+            self._admit(priority, count)
+
+    def _admit(self, priority, count):
+        # Caller holds self._lock
+        pending = sum(self._pending.values())
+        limit = self.max_pending if priority == PRIORITY_INTERACTIVE else self.max_pending - self.interactive_reserve
+        if pending + count > limit:
+            name = PRIORITY_NAMES.get(priority, priority)
+            metrics.inc("admission_rejected_total", priority=name)
+            raise QueueFull(f"Queue is full ({pending} commands waiting, limit {limit} for {name} work).",
+                            self._retry_after(pending + count - limit))
+
+    def _retry_after(self, slots):
+        """Whole seconds until about slots queued jobs have started, from the average run time."""
+        average = self._avg_run_seconds or 1.0
+        return max(1, math.ceil(average * slots / self.workers))
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.state == JOB_RUNNING)
+            return {
+                "workers": self.workers,
+                "pending": sum(self._pending.values()),
+                "pending_by_priority": {PRIORITY_NAMES[p]: n for p, n in self._pending.items()},
+                "max_pending": self.max_pending,
+                "interactive_reserve": self.interactive_reserve,
+                "running": running,
+                "tracked": len(self._jobs),
+                "avg_run_seconds": round(self._avg_run_seconds, 3) if self._avg_run_seconds else None,
+            }
+
+    # --- Worker Internals ---
+    def _worker_loop(self):
+        while True:
+            _priority, _seq, target = self._ready.get()
+            if target is None:
+                return
+            with self._lock:
+                lane = self._lanes.get(target)
+                job = lane.popleft() if lane else None
+                if job is not None:
+                    self._pending[job.priority] -= 1
+            if job is not None:
+                self._run(job)
+            with self._lock:
+                lane = self._lanes.get(target)
+                if lane:
+                    # More work queued for this window: hand the lane back so
+                    # the next job runs only after this one has finished.
+                    self._ready.put((lane[0].priority, next(self._seq), target))
+                else:
+                    self._lanes.pop(target, None)
+                    self._active_lanes.discard(target)
+
+    def _run(self, job):
+        job.state = JOB_RUNNING
+        job.started_at = time.time()
+        metrics.observe("queue_wait_seconds", job.started_at - job.created_at,
+                        priority=PRIORITY_NAMES.get(job.priority, job.priority))
+        job.add_event("started")
+        token = _current_job.set(job)
+        try:
+            with log_context(request_id=job.id, **job.log_fields):
+                job.result = job.func(*job.args)
+            job.status_code = 200
+            job.state = JOB_SUCCEEDED
+        except Exception as e:
+            # HTTPException-style errors carry their own status and detail
+            job.status_code = getattr(e, "status_code", 500)
+            job.error = getattr(e, "detail", None) or str(e)
+            job.state = JOB_FAILED
+        finally:
+            _current_job.reset(token)
+            job.finished_at = time.time()
+            run_seconds = job.finished_at - job.started_at
+            with self._lock:
+                self._avg_run_seconds = run_seconds if self._avg_run_seconds is None else \
+                    0.8 * self._avg_run_seconds + 0.2 * run_seconds
+            if job.error is None:
+                job.add_event("done", result=job.result)
+            else:
+                job.add_event("error", status_code=job.status_code, detail=job.error)
+            job.done.set()
+            self._prune()
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+            excess = len(finished) - self.max_finished
+            for job_id in finished[:max(0, excess)]:
+                del self._jobs[job_id]
+
+
+def emit(event, **data):
+    """Reports a progress event for the job running on this thread (no-op outside a job)."""
+    job = _current_job.get()
+    if job is not None:
+        job.add_event(event, **data)
@@ -0,0 +1,137 @@
+"""
+Logging pipeline for the Terminator Agent.
+
+Request handling only puts records on an in-memory queue; a background
+QueueListener does the file and console I/O. The log file gets one JSON object
+per line (timestamp, level, message, request id, app alias, phase, duration)
+and is rotated by size, or by time when TERMINATOR_LOG_ROTATE_WHEN is set.
+Console output can be switched off with TERMINATOR_CONSOLE=0.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from contextlib import contextmanager
+from datetime import datetime
+
+# --- Logging Settings ---
+LOG_FILE = os.environ.get("TERMINATOR_LOG_FILE", "terminator_log.txt")
+LOG_MAX_BYTES = int(os.environ.get("TERMINATOR_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("TERMINATOR_LOG_BACKUPS", "5"))
+LOG_ROTATE_WHEN = os.environ.get("TERMINATOR_LOG_ROTATE_WHEN") # e.g. "midnight" or "H"
+CONSOLE_ENABLED = os.environ.get("TERMINATOR_CONSOLE", "1").lower() not in ("0", "false", "no", "off")
+
+# Structured fields copied from a record into its JSON line when present
+STRUCTURED_FIELDS = ("request_id", "app", "phase", "duration_ms")
+
+CONSOLE_LOGGER = "terminator.console" # child of "terminator", console-only
+
+log = logging.getLogger("terminator")
+_console_log = logging.getLogger(CONSOLE_LOGGER)
+_context = contextvars.ContextVar("terminator_log_context", default={})
+_listener = None
+
+
+@contextmanager
+def log_context(**fields):
+    """Attaches fields (e.g. request_id, app) to every record logged inside the block."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the active log_context onto records before they are queued."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Formats a record as a single JSON line; newlines in payloads stay escaped."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for key in STRUCTURED_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        extra_fields = getattr(record, "fields", None)
+        if extra_fields:
+            entry.update(extra_fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _not_console(record):
+    return record.name != CONSOLE_LOGGER
+
+def _build_file_handler(path):
+    if LOG_ROTATE_WHEN:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    handler.setFormatter(JsonLineFormatter())
+    handler.addFilter(_not_console)
+    return handler
+
+def setup_logging(path=LOG_FILE, console=CONSOLE_ENABLED, level=logging.INFO):
+    """Routes the agent's logging through a queue drained by a background listener."""
+    global _listener
+    if _listener is not None:
+        return _listener
+    handlers = [_build_file_handler(path)]
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+        handlers.append(stream)
+
+    record_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(record_queue)
+    queue_handler.addFilter(ContextFilter())
+    # Only the agent's own loggers ("terminator" and its children) are routed
+    # here; third-party libraries keep their default handling.
+    log.setLevel(level)
+    log.addHandler(queue_handler)
+    log.propagate = False
+
+    _listener = logging.handlers.QueueListener(record_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+def stop_logging():
+    """Flushes queued records and stops the listener thread (runs at exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def console(message):
+    """Console-only progress output (never written to the log file)."""
+    if _listener is None:
+        print(message)
+    elif CONSOLE_ENABLED:
+        _console_log.info(message)
+
+def log_event(level, message, phase=None, duration_ms=None, **fields):
+    """Logs a structured record; extra keyword fields are added to the JSON line."""
+    extra = {"phase": phase, "fields": fields or None}
+    if duration_ms is not None:
+        extra["duration_ms"] = round(duration_ms, 1)
+    log.log(level, message, extra=extra)
@@ -0,0 +1,417 @@
+"""
+Log analytics for the Terminator Agent.
+
+Answers the weekly questions (which aliases fail, how long commands and
+typing take per app, how often fallbacks such as Alt+Tab are used) from
+terminator_log.txt without grepping through multi-line code payloads.
+
+The log is read through mmap and only the lines that start a record are
+decoded. Each command becomes one index entry (byte offset, timestamp, app,
+outcome, durations, fallbacks), with postings by app and outcome, stored in
+an on-disk JSON index next to the log. A re-run only scans bytes appended
+since the last one. When the log was rotated (or truncated), the rest of
+the old file and any generations rotated since the last run are read from
+the backups (terminator_log.txt.1, ...), oldest first, and each file becomes
+another segment of the same index, so history is kept. A rebuild reads the
+backups too.
+
+Both formats are understood:
+- JSON lines written by terminator_logging (records joined by request_id)
+- the legacy "YYYY-MM-DD HH:MM:SS - message" text format, where a request's
+  outcome is the next "Action performed"/"Error" line
+
+    python terminator_logstats.py                      # per-alias summary
+    python terminator_logstats.py --since 7d --app notepad
+    python terminator_logstats.py --show-failures 5    # raw log text of recent failures
+"""
+import argparse
+import glob
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from terminator_logging import LOG_FILE
+
+# --- Index Settings ---
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".index.json"
+HEAD_BYTES = 256        # hashed to notice that the log was rotated or replaced
+MAX_PENDING = 1000      # JSON requests still waiting for their outcome record
+SHOW_BYTES = 2000       # raw log text printed per --show-failures entry
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_NOT_FOUND = "not_found"
+OUTCOME_ERROR = "error"
+# JSON "phase" of a failure record -> outcome
+FAILURE_PHASES = {"resolve": OUTCOME_NOT_FOUND, "spawn": OUTCOME_NOT_FOUND, "save": OUTCOME_ERROR, "error": OUTCOME_ERROR}
+
+JSON_HEAD = b'{"ts": "'
+JSON_TAIL = b', "request_id": ' # quotes inside msg are escaped, so this only matches the field
+LEGACY_RE = re.compile(rb"(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) - ")
+LEGACY_APP_RE = re.compile(r"app='([^']*)'(?: \(alias='([^']*)'\))?")
+LEGACY_NOT_FOUND = ("not found", "does not exist")
+LEGACY_TYPING_ERROR = "Error during typing action"
+SINCE_RE = re.compile(r"(\d+(?:\.\d+)?)([mhdw])")
+SINCE_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+# Entry columns: [offset of the request record, ts, app, outcome, total_ms, type_ms, fallbacks,
+#                 offset of the outcome record, segment (log file generation) of the offsets]
+OFFSET, TS, APP, OUTCOME, TOTAL_MS, TYPE_MS, FALLBACKS, OUTCOME_OFFSET, SEGMENT = range(9)
+
+
+def _epoch(text):
+    return datetime.fromisoformat(text).timestamp()
+
+def _head_hash(mm):
+    return hashlib.sha1(mm[:HEAD_BYTES]).hexdigest()
+
+def new_index(path):
+    # heads: head hash of every log file generation indexed so far; the last one is the live log
+    return {"version": INDEX_VERSION, "log": os.path.abspath(path), "offset": 0, "heads": [],
+            "entries": [], "by_app": {}, "by_outcome": {}, "pending": {}, "legacy_pending": None}
+
+def rotated_paths(log_path):
+    """Backups written by the rotating handlers (log.1, log.2, log.2025-05-01, ...), newest first."""
+    paths = [path for path in glob.glob(glob.escape(log_path) + ".*")
+             if not path.endswith((INDEX_SUFFIX, ".tmp"))]
+    return sorted(paths, key=lambda path: os.path.getmtime(path), reverse=True)
+
+
+class LogIndex:
+    """Incrementally maintained command index for one log file."""
+
+    def __init__(self, log_path, index_path=None):
+        self.log_path = log_path
+        self.index_path = index_path or log_path + INDEX_SUFFIX
+        self.data = new_index(log_path)
+        self.scanned_bytes = 0
+        self.rebuilt = False
+        self.rotated = False
+
+    # --- Persistence ---
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION:
+            return False
+        self.data = data
+        return True
+
+    def save(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.data, separators=(",", ":"))) # dumps() uses the C encoder, dump() does not
+        os.replace(tmp_path, self.index_path)
+
+    # --- Scanning ---
+    def update(self, rebuild=False):
+        """Indexes bytes appended since the last run. Returns the number of bytes scanned."""
+        if rebuild or not self.load():
+            self.data = new_index(self.log_path)
+            self.rebuilt = True
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            return 0
+        if size == 0:
+            return 0
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            head = _head_hash(mm)
+            heads = self.data["heads"]
+            if not heads or heads[-1] != head or size < self.data["offset"]:
+                # New index, or the log was rotated, truncated or replaced: keep
+                # the entries, catch up on the backups and index the live file
+                # as a new segment
+                self.rotated = bool(heads)
+                self._scan_backups()
+                heads.append(head)
+                self.data.update(offset=0, pending={}, legacy_pending=None)
+            start = self.data["offset"]
+            end = mm.rfind(b"\n", start) + 1 # a trailing partial line waits for the next run
+            if end > start:
+                self._scan(mm, start, end)
+                self.data["offset"] = end
+                self.scanned_bytes += end - start
+        if self.scanned_bytes or self.rebuilt or self.rotated:
+            self.save()
+        return self.scanned_bytes
+
+    def _scan_backups(self):
+        """
+        Walks the rotated backups oldest first: finishes the generation the
+        index was reading when the log rotated, indexes every generation it
+        has not seen as a new segment and skips the ones already indexed.
+        Backups deleted in the meantime are lost.
+        """
+        heads = self.data["heads"]
+        for path in reversed(rotated_paths(self.log_path)):
+            try:
+                if os.path.getsize(path) == 0:
+                    continue
+                with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    head = _head_hash(mm)
+                    if heads and head == heads[-1]:
+                        start = self.data["offset"]
+                    elif head in heads:
+                        continue
+                    else:
+                        heads.append(head)
+                        self.data.update(offset=0, pending={}, legacy_pending=None)
+                        start = 0
+                    end = mm.rfind(b"\n", start) + 1
+                    if end > start:
+                        self._scan(mm, start, end)
+                        self.data["offset"] = end
+                        self.scanned_bytes += end - start
+            except OSError as e:
+                print(f"Warning: Could not read rotated log '{path}': {e}", file=sys.stderr)
+
+    def segment_path(self, segment):
+        """The file holding a segment: the live log or the backup with the same head hash, or None."""
+        heads = self.data["heads"]
+        if segment == len(heads) - 1:
+            return self.log_path
+        for path in rotated_paths(self.log_path):
+            try:
+                with open(path, "rb") as f:
+                    if hashlib.sha1(f.read(HEAD_BYTES)).hexdigest() == heads[segment]:
+                        return path
+            except OSError:
+                continue
+        return None
+
+    def _scan(self, mm, position, end):
+        find = mm.find
+        while position < end:
+            line_end = find(b"\n", position, end)
+            first = mm[position:position + 1]
+            if first == b"{":
+                self._json_record(mm[position:line_end], position)
+            elif first.isdigit():
+                match = LEGACY_RE.match(mm, position, line_end)
+                if match:
+                    self._legacy_record(match, mm[match.end():line_end], position)
+            # Anything else continues a multi-line legacy message (e.g. code payloads)
+            position = line_end + 1
+
+    def _add(self, started, outcome, outcome_offset, total_ms=None, type_ms=None, fallbacks=None):
+        data = self.data
+        position = len(data["entries"])
+        offset, ts, app = started[:3]
+        data["entries"].append([offset, ts, app, outcome, total_ms, type_ms, fallbacks or [], outcome_offset,
+                                len(data["heads"]) - 1])
+        data["by_app"].setdefault(app, []).append(position)
+        data["by_outcome"].setdefault(outcome, []).append(position)
+
+    def _json_record(self, raw, offset):
+        # terminator_logging writes ts, level and msg first; msg can be a large
+        # code payload, so only ts and the structured fields after it are parsed
+        tail = raw.rfind(JSON_TAIL) if raw.startswith(JSON_HEAD) else -1
+        try:
+            if tail != -1:
+                record = json.loads("{" + raw[tail + 2:].decode("utf-8"))
+                record["ts"] = raw[len(JSON_HEAD):raw.index(b'"', len(JSON_HEAD))].decode("ascii")
+            else:
+                record = json.loads(raw.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            return
+        phase = record.get("phase")
+        request_id = record.get("request_id")
+        if not request_id or phase is None:
+            return
+        pending = self.data["pending"]
+        if phase == "received":
+            pending[request_id] = [offset, _epoch(record["ts"]), record.get("app", "?")]
+            if len(pending) > MAX_PENDING:
+                del pending[next(iter(pending))] # outcome never logged (e.g. agent killed)
+            return
+        if phase == "done":
+            outcome = OUTCOME_SUCCESS
+        elif phase in FAILURE_PHASES:
+            outcome = FAILURE_PHASES[phase]
+        else:
+            return # intermediate records such as a failed typing attempt
+        started = pending.pop(request_id, None)
+        if started is None:
+            started = [offset, _epoch(record["ts"]), record.get("app", "?")]
+        timings = record.get("timings") or {}
+        self._add(started, outcome, offset, record.get("duration_ms"), timings.get("type_ms"), record.get("fallbacks"))
+
+    def _legacy_record(self, match, first_line, offset):
+        ts = _epoch(match.group(1).decode("ascii"))
+        message = first_line.decode("utf-8", "replace")
+        if message.startswith("Request received:"):
+            found = LEGACY_APP_RE.search(message)
+            app = (found.group(2) or found.group(1)).lower() if found else "?"
+            self.data["legacy_pending"] = [offset, ts, app, []]
+            return
+        started = self.data["legacy_pending"]
+        if started is None:
+            return
+        if message.startswith(LEGACY_TYPING_ERROR):
+            started[3].append("typing_failed") # the request still ends with "Action performed"
+            return
+        if message.startswith("Action performed:"):
+            outcome = OUTCOME_SUCCESS
+        elif message.startswith("Error"):
+            outcome = OUTCOME_NOT_FOUND if any(text in message for text in LEGACY_NOT_FOUND) else OUTCOME_ERROR
+        else:
+            return # warnings between the request and its outcome
+        self.data["legacy_pending"] = None
+        # The legacy format has second resolution and no per-phase timings
+        self._add(started, outcome, offset, round((ts - started[1]) * 1000, 1), fallbacks=started[3])
+
+    # --- Queries ---
+    def select(self, since=None, app=None, outcome=None):
+        """Entries matching the filters, in the order they finished, using the postings."""
+        entries = self.data["entries"]
+        positions = None
+        if app is not None:
+            positions = self.data["by_app"].get(app.lower(), [])
+        if outcome is not None:
+            matching = self.data["by_outcome"].get(outcome, [])
+            positions = matching if positions is None else sorted(set(positions) & set(matching))
+        if positions is None:
+            positions = range(len(entries))
+        if since is not None:
+            # Entries are appended when a command finishes but TS is when it
+            # started, so with several workers TS is not sorted: filter, don't bisect
+            positions = [p for p in positions if entries[p][TS] >= since]
+        return [entries[p] for p in positions]
+
+    def raw_text(self, entry, limit=SHOW_BYTES):
+        """The request and outcome records of a command, read at their indexed offsets."""
+        path = self.segment_path(entry[SEGMENT])
+        if path is None:
+            return "(rotated log file no longer available)"
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offsets = dict.fromkeys((entry[OFFSET], entry[OUTCOME_OFFSET]))
+            return "\n".join(_record_at(mm, offset, limit) for offset in offsets)
+
+
+def _record_at(mm, offset, limit):
+    """Text of the record starting at offset, including continuation lines, up to limit bytes."""
+    end = min(len(mm), offset + limit)
+    position = mm.find(b"\n", offset, end)
+    while position != -1 and position + 1 < end:
+        following = mm[position + 1:position + 2]
+        if following == b"{" or LEGACY_RE.match(mm, position + 1, end):
+            end = position
+            break
+        position = mm.find(b"\n", position + 1, end)
+    return mm[offset:end].decode("utf-8", "replace").rstrip()
+
+
+# --- Reporting ---
+def percentile(values, fraction):
+    """Nearest-rank percentile, or None when there are no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(fraction * len(ordered))) - 1]
+
+def summarize(entries):
+    """Per-alias failure rates, latencies and fallback usage."""
+    apps = {}
+    fallbacks = {}
+    for entry in entries:
+        row = apps.setdefault(entry[APP], {"commands": 0, "failed": 0, "not_found": 0, "total_ms": [], "type_ms": [],
+                                           "alt_tab": 0})
+        row["commands"] += 1
+        if entry[OUTCOME] != OUTCOME_SUCCESS:
+            row["failed"] += 1
+            row["not_found"] += entry[OUTCOME] == OUTCOME_NOT_FOUND
+        if entry[TOTAL_MS] is not None:
+            row["total_ms"].append(entry[TOTAL_MS])
+        if entry[TYPE_MS] is not None:
+            row["type_ms"].append(entry[TYPE_MS])
+        for kind in set(entry[FALLBACKS]):
+            fallbacks[kind] = fallbacks.get(kind, 0) + 1
+        row["alt_tab"] += "alt_tab" in entry[FALLBACKS]
+
+    summary = {}
+    for app, row in sorted(apps.items(), key=lambda item: (-item[1]["commands"], item[0])):
+        summary[app] = {
+            "commands": row["commands"],
+            "failed": row["failed"],
+            "not_found": row["not_found"],
+            "failure_rate": round(row["failed"] / row["commands"], 3),
+            "p50_ms": percentile(row["total_ms"], 0.50),
+            "p95_ms": percentile(row["total_ms"], 0.95),
+            "type_p50_ms": percentile(row["type_ms"], 0.50),
+            "type_p95_ms": percentile(row["type_ms"], 0.95),
+            "alt_tab_rate": round(row["alt_tab"] / row["commands"], 3),
+        }
+    return {"commands": len(entries), "apps": summary,
+            "fallbacks": dict(sorted(fallbacks.items(), key=lambda item: -item[1]))}
+
+def print_summary(report, index, elapsed):
+    def cell(value, suffix=""):
+        return "-" if value is None else f"{value:.0f}{suffix}"
+
+    print(f"Terminator log: {index.log_path} ({report['commands']} commands; scanned {index.scanned_bytes} new bytes "
+          f"in {elapsed * 1000:.0f} ms{', index rebuilt' if index.rebuilt else ''}"
+          f"{', log rotated' if index.rotated else ''})")
+    print(f"{'alias':<16}{'cmds':>6}{'failed':>8}{'fail %':>8}{'p50 ms':>9}{'p95 ms':>9}{'type p50':>10}{'type p95':>10}{'alt-tab %':>11}")
+    for app, row in report["apps"].items():
+        print(f"{app[:15]:<16}{row['commands']:>6}{row['failed']:>8}{row['failure_rate'] * 100:>8.1f}"
+              f"{cell(row['p50_ms']):>9}{cell(row['p95_ms']):>9}{cell(row['type_p50_ms']):>10}"
+              f"{cell(row['type_p95_ms']):>10}{row['alt_tab_rate'] * 100:>11.1f}")
+    if report["fallbacks"]:
+        total = report["commands"] or 1
+        print("Fallbacks: " + ", ".join(f"{kind} {count} ({count * 100 / total:.1f}%)"
+                                        for kind, count in report["fallbacks"].items()))
+
+def parse_since(text):
+    """'7d', '12h', '30m', '2w' or an ISO date/time -> epoch seconds."""
+    match = SINCE_RE.fullmatch(text.strip())
+    if match:
+        return time.time() - timedelta(**{SINCE_UNITS[match.group(2)]: float(match.group(1))}).total_seconds()
+    return _epoch(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Failure rates and latency summaries from the Terminator log.")
+    parser.add_argument("--log", default=LOG_FILE, help="Log file to analyze (default: TERMINATOR_LOG_FILE).")
+    parser.add_argument("--index", help=f"Index file (default: <log>{INDEX_SUFFIX}).")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the existing index and rescan the whole log.")
+    parser.add_argument("--since", help="Only commands since then: 7d, 12h, 30m, 2w or an ISO date.")
+    parser.add_argument("--app", help="Only this alias.")
+    parser.add_argument("--show-failures", type=int, metavar="N", help="Print the log text of the last N failed commands.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.log):
+        print(f"Error: Log file '{args.log}' not found.", file=sys.stderr)
+        return 1
+    started = time.perf_counter()
+    index = LogIndex(args.log, args.index)
+    index.update(rebuild=args.rebuild)
+    since = parse_since(args.since) if args.since else None
+    entries = index.select(since=since, app=args.app)
+    report = summarize(entries)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_summary(report, index, elapsed)
+    if args.show_failures:
+        failures = [entry for entry in entries if entry[OUTCOME] != OUTCOME_SUCCESS][-args.show_failures:]
+        for entry in failures:
+            print(f"\n--- {entry[APP]} {entry[OUTCOME]} at byte {entry[OFFSET]} ---")
+            print(index.raw_text(entry))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
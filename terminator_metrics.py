@@ -0,0 +1,153 @@
+"""
+Latency and fallback metrics for the Terminator Agent.
+
+Each phase of a command (alias resolution, spawn, window wait, activation,
+typing, auto-save) is timed and kept as a histogram per app alias; fallbacks
+such as the Alt+Tab activation are counted. Everything is rendered in the
+Prometheus text exposition format for the /metrics endpoint.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Metric Settings ---
+# Histogram bucket upper bounds in seconds
+PHASE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Label used instead of user-supplied names that did not resolve, to keep
+# label cardinality bounded
+UNRESOLVED_APP = "unresolved"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects it."""
+
+    def __init__(self, buckets=PHASE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class MetricsRegistry:
+    """Thread-safe store for phase histograms, counters and gauges."""
+
+    def __init__(self, prefix="terminator"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {} # (name, labels) -> Histogram
+        self._counters = {}   # (name, labels) -> float
+        self._help = {}
+        self._gauge_sources = [] # callables returning [(name, labels, value), ...]
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_gauge_source(self, source):
+        """Registers a callable polled at render time for point-in-time gauges."""
+        self._gauge_sources.append(source)
+
+    def render(self):
+        """Prometheus text exposition of every metric."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        seen = set()
+        for (name, labels), histogram in histograms:
+            full = f"{self.prefix}_{name}"
+            if full not in seen:
+                seen.add(full)
+                lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {full} histogram")
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f"{full}_bucket{_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{full}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{full}_sum{_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{full}_count{_labels(labels)} {histogram.count}")
+
+        for (name, labels), value in counters:
+            full = f"{self.prefix}_{name}"
+            if full not in seen:
+                seen.add(full)
+                lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{_labels(labels)} {value}")
+
+        for source in self._gauge_sources:
+            for name, labels, value in source():
+                full = f"{self.prefix}_{name}"
+                if full not in seen:
+                    seen.add(full)
+                    lines.append(f"# HELP {full} {self._help.get(name, name)}")
+                    lines.append(f"# TYPE {full} gauge")
+                lines.append(f"{full}{_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("phase_seconds", "Time spent in each phase of a command, per app alias.")
+metrics.describe("fallbacks_total", "Commands that had to take a fallback path, by kind and app alias.")
+metrics.describe("commands_total", "Commands executed, by app alias and outcome.")
+
+
+class PhaseTimer:
+    """
+    Times the phases of one command.
+
+    Durations go into the shared phase_seconds histogram and are also kept
+    locally (with the fallbacks taken) so they can be returned with the
+    response when debugging and written to the command's final log line.
+    """
+
+    def __init__(self, app=UNRESOLVED_APP, registry=metrics):
+        self.app = app
+        self.registry = registry
+        self.timings = {}
+        self.fallbacks = []
+
+    def record(self, phase, seconds):
+        self.registry.observe("phase_seconds", seconds, phase=phase, app=self.app)
+        self.timings[f"{phase}_ms"] = round(self.timings.get(f"{phase}_ms", 0) + seconds * 1000, 1)
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started)
+
+    def fallback(self, kind):
+        self.fallbacks.append(kind)
+        self.registry.inc("fallbacks_total", kind=kind, app=self.app)
@@ -0,0 +1,317 @@
+"""
+Executable resolution index for the Terminator Agent.
+
+Resolving an alias used to cost an os.path.exists probe per request, and
+aliases whose mapped path was missing only failed after a spawn attempt. The
+AppResolver builds an alias -> executable index once (from APP_MAP, PATH and
+extra search roots), answers lookups from memory, and keeps the index fresh
+with a background refresh. The index is persisted as a compact JSON cache so
+a restarted agent is warm immediately.
+
+APP_MAP targets may contain %VAR% references; they are expanded when the
+index is first built, and that build runs on the background refresh thread,
+so neither slows down importing or starting the agent. Lookups made before
+the first build finishes wait for it (up to READY_TIMEOUT seconds).
+"""
+import difflib
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from terminator_logging import console
+
+# --- Resolver Settings ---
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "terminator_app_index.json")
+# Seconds between background checks for changed PATH/search-root directories
+REFRESH_INTERVAL = float(os.environ.get("TERMINATOR_RESOLVER_REFRESH", "300"))
+# How deep to walk below each extra search root (PATH entries are not walked)
+SEARCH_ROOT_DEPTH = 3
+# Minimum similarity for a near-miss alias to be accepted
+FUZZY_CUTOFF = 0.8
+# Fuzzy results are memoized per input; cap the memo since inputs are user text
+FUZZY_MEMO_LIMIT = 1024
+# Seconds a lookup waits for the initial background build
+READY_TIMEOUT = float(os.environ.get("TERMINATOR_RESOLVER_READY_TIMEOUT", "30"))
+
+Resolution = namedtuple("Resolution", ["path", "alias", "how"])
+
+
+def normalize_alias(name):
+    """Canonical index key: lowercase, single spaces, no .exe suffix."""
+    key = " ".join(str(name).lower().split())
+    return key[:-4] if key.endswith(".exe") else key
+
+def executable_extensions():
+    if os.name == "nt":
+        return {ext.lower() for ext in os.environ.get("PATHEXT", ".COM;.EXE;.BAT;.CMD").split(";") if ext}
+    return {""}
+
+def default_search_roots():
+    """Extra roots from TERMINATOR_SEARCH_ROOTS, else per-user program installs."""
+    configured = os.environ.get("TERMINATOR_SEARCH_ROOTS")
+    if configured is not None:
+        return [root for root in configured.split(os.pathsep) if root]
+    local_programs = os.path.expandvars(r"%LOCALAPPDATA%\Programs")
+    return [local_programs] if "%" not in local_programs else []
+
+
+class AppResolver:
+    """
+    O(1) alias -> executable lookups backed by a prebuilt, cached index.
+
+    A static_index ({alias: executable}) replaces the filesystem scan
+    entirely, e.g. for the simulated desktop driver; it is never cached.
+    """
+
+    def __init__(self, app_map, synonyms=None, search_roots=None, cache_path=DEFAULT_CACHE_PATH,
+                 refresh_interval=REFRESH_INTERVAL, static_index=None):
+        self.app_map = dict(app_map)
+        self.synonyms = {normalize_alias(k): normalize_alias(v) for k, v in (synonyms or {}).items()}
+        self._curated = sorted({normalize_alias(a) for a in self.app_map} | set(self.synonyms))
+        self.search_roots = list(search_roots) if search_roots is not None else default_search_roots()
+        self.static_index = static_index
+        self.cache_path = cache_path if static_index is None else None
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._index = {}
+        self._fingerprint = None
+        self._fuzzy_memo = {}
+        self._built_at = None
+        self._stop = threading.Event()
+        self._wake = threading.Event() # cuts the refresh interval short after invalidate()
+        self._thread = None
+        self._ready = threading.Event()
+        self._expanded = None
+        self.build_seconds = None
+
+    # --- Index Construction ---
+    def expanded_map(self):
+        """APP_MAP with environment variables expanded (done once, on first use)."""
+        if self._expanded is None:
+            self._expanded = {alias: os.path.expandvars(target) for alias, target in self.app_map.items()}
+        return self._expanded
+
+    def _watched_dirs(self):
+        path_dirs = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+        # Install folders of mapped apps, so installing/removing one is noticed
+        mapped_dirs = sorted({os.path.dirname(t) for t in self.expanded_map().values() if os.path.isabs(t)})
+        return path_dirs + self.search_roots + mapped_dirs
+
+    def _fingerprint_now(self):
+        """Cheap change detector: APP_MAP contents plus mtimes of watched directories."""
+        digest = hashlib.sha1(json.dumps(self.expanded_map(), sort_keys=True).encode("utf-8"))
+        for directory in self._watched_dirs():
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtime = 0
+            digest.update(f"{directory}\0{mtime}\0".encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def _scan_dir(self, directory, index, extensions, depth):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if depth > 0:
+                        self._scan_dir(entry.path, index, extensions, depth - 1)
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                if os.name == "nt":
+                    if ext.lower() not in extensions:
+                        continue
+                elif not os.access(entry.path, os.X_OK):
+                    continue
+                # First hit wins, matching PATH search order
+                index.setdefault(normalize_alias(stem if os.name == "nt" else entry.name), entry.path)
+            except OSError:
+                continue
+
+    def build(self):
+        """Scans APP_MAP, PATH and search roots into a fresh index."""
+        if self.static_index is not None:
+            index = {normalize_alias(alias): path for alias, path in self.static_index.items()}
+            self._install(index, "static")
+            return index
+        started = time.monotonic()
+        fingerprint = self._fingerprint_now()
+        extensions = executable_extensions()
+        discovered = {}
+        for directory in os.environ.get("PATH", "").split(os.pathsep):
+            if directory:
+                self._scan_dir(directory, discovered, extensions, depth=0)
+        for root in self.search_roots:
+            self._scan_dir(root, discovered, extensions, depth=SEARCH_ROOT_DEPTH)
+
+        index = {}
+        for alias, target in self.expanded_map().items():
+            if os.path.isabs(target):
+                if os.path.exists(target):
+                    index[normalize_alias(alias)] = target
+            else:
+                # Bare names such as 'calc.exe' resolve through PATH
+                found = discovered.get(normalize_alias(target))
+                if found:
+                    index[normalize_alias(alias)] = found
+        for alias, path in discovered.items():
+            index.setdefault(alias, path)
+
+        self._install(index, fingerprint)
+        console(f"Resolver index built: {len(index)} executables in {time.monotonic() - started:.2f}s")
+        self.save_cache()
+        return index
+
+    def _install(self, index, fingerprint):
+        with self._lock:
+            self._index = index
+            self._fingerprint = fingerprint
+            self._fuzzy_memo = {}
+            self._built_at = time.time()
+        self._ready.set()
+
+    # --- Persistence ---
+    def save_cache(self):
+        if not self.cache_path:
+            return
+        with self._lock:
+            payload = {"version": CACHE_VERSION, "fingerprint": self._fingerprint,
+                       "built_at": self._built_at, "index": self._index}
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, separators=(",", ":"))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            console(f"Warning: Could not write resolver cache '{self.cache_path}': {e}")
+
+    def load_cache(self):
+        """Loads the on-disk index. Returns False if it is missing or stale."""
+        if not self.cache_path:
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if payload.get("version") != CACHE_VERSION or payload.get("fingerprint") != self._fingerprint_now():
+            return False
+        self._install(payload.get("index") or {}, payload["fingerprint"])
+        console(f"Resolver index loaded from cache: {len(self._index)} executables")
+        return True
+
+    def load_or_build(self):
+        started = time.monotonic()
+        try:
+            if not self.load_cache():
+                self.build()
+        finally:
+            self.build_seconds = round(time.monotonic() - started, 3)
+            self._ready.set() # a failed build must not block lookups forever
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=READY_TIMEOUT):
+        """Blocks until the initial index is available. Returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    # --- Background Refresh ---
+    def refresh_if_changed(self):
+        if self.static_index is not None:
+            return
+        if self._fingerprint_now() != self._fingerprint:
+            console("Resolver: PATH or search roots changed, rebuilding index...")
+            self.build()
+
+    def invalidate(self):
+        """Rebuilds the index right away on the background thread (e.g. after a failed spawn)."""
+        with self._lock:
+            self._fingerprint = None
+        self._wake.set()
+
+    def start_background_refresh(self):
+        """Builds the initial index (if needed) and then refreshes it, on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="terminator-resolver", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _refresh_loop(self):
+        if not self.ready:
+            try:
+                self.load_or_build()
+            except Exception as e:
+                console(f"Resolver initial build failed: {e}")
+        while True:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refresh_if_changed()
+            except Exception as e:
+                console(f"Resolver background refresh failed: {e}")
+
+    # --- Lookups ---
+    def resolve(self, name):
+        """
+        Resolves an alias or executable name to a Resolution, or None.
+
+        Tries a configured synonym, then an exact alias, then a fuzzy match
+        against known aliases (memoized until the next rebuild). Explicit
+        absolute paths are passed through if they exist.
+        """
+        key = normalize_alias(name)
+        if not self._ready.is_set():
+            self.wait_ready()
+        with self._lock:
+            # Configured synonyms win over incidental PATH names (e.g. 'code')
+            synonym = self.synonyms.get(key)
+            if synonym and synonym in self._index:
+                return Resolution(self._index[synonym], synonym, "synonym")
+            path = self._index.get(key)
+            if path:
+                return Resolution(path, key, "exact")
+            if key in self._fuzzy_memo:
+                match = self._fuzzy_memo[key]
+            else:
+                close = difflib.get_close_matches(key, self._fuzzy_candidates(), n=1, cutoff=FUZZY_CUTOFF)
+                match = self.synonyms.get(close[0], close[0]) if close else None
+                if len(self._fuzzy_memo) >= FUZZY_MEMO_LIMIT:
+                    self._fuzzy_memo.clear()
+                self._fuzzy_memo[key] = match
+            if match and match in self._index:
+                return Resolution(self._index[match], match, "fuzzy")
+        if os.path.isabs(str(name)) and os.path.exists(name):
+            return Resolution(name, key, "path")
+        return None
+
+    def _fuzzy_candidates(self):
+        # Only curated names take part in fuzzy matching; a near-miss must
+        # never launch some unrelated executable that happens to be on PATH.
+        return [alias for alias in self._curated if alias in self._index or alias in self.synonyms]
+
+    def suggestions(self, name, limit=3):
+        with self._lock:
+            return difflib.get_close_matches(normalize_alias(name), self._fuzzy_candidates(), n=limit, cutoff=0.5)
+
+    def stats(self):
+        with self._lock:
+            return {"executables": len(self._index), "ready": self._ready.is_set(), "built_at": self._built_at,
+                    "build_seconds": self.build_seconds, "search_roots": self.search_roots, "fuzzy_memo": len(self._fuzzy_memo)}
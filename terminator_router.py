@@ -0,0 +1,466 @@
+"""
+Router in front of several Terminator agents.
+
+Each workstation runs its own terminator_agent. The router speaks the same
+API (/execute, /execute/stream, /execute/batch, /jobs/...), so the frontend
+only needs to know one URL. For every command it picks an agent:
+
+1. the agent named by a target hint (`target` field or X-Terminator-Target),
+2. otherwise the agent this user was routed to before (sticky session, by
+   `user` field or X-Terminator-User), while it stays healthy,
+3. otherwise the healthy agent with the least load per desktop worker.
+
+A background task polls every agent's health endpoint for its queue depth.
+Requests go through one pooled keep-alive HTTP client per agent. Job ids are
+remembered, so /jobs/{id} lookups reach the agent that owns the job.
+
+Run with:
+    TERMINATOR_AGENTS="desk1=http://10.0.0.21:8000,desk2=http://10.0.0.22:8000" python terminator_router.py
+    python terminator_router.py --standins 3    # three local agents on the simulated driver
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+
+# --- Router Settings ---
+# Comma-separated "name=url" entries (a bare URL is named after its host:port)
+AGENTS = os.environ.get("TERMINATOR_AGENTS", "")
+HEALTH_INTERVAL = float(os.environ.get("TERMINATOR_ROUTER_HEALTH_INTERVAL", "2"))
+HEALTH_TIMEOUT = 2.0
+# Seconds a user stays pinned to the agent they were last routed to
+STICKY_TTL = float(os.environ.get("TERMINATOR_ROUTER_STICKY_TTL", "1800"))
+# Keep-alive connections per agent
+POOL_SIZE = int(os.environ.get("TERMINATOR_ROUTER_POOL_SIZE", "20"))
+REQUEST_TIMEOUT = 30.0
+MAX_RESULT_WAIT = 60.0 # the agents cap /jobs/{id}/result?wait= at this
+MAX_TRACKED_JOBS = 10000
+MAX_STICKY_USERS = 10000
+STANDIN_BASE_PORT = 8101
+STANDIN_STARTUP_TIMEOUT = 20.0
+AGENT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "terminator_agent.py")
+
+
+def parse_agents(spec):
+    """'desk1=http://host:8000,http://other:8000' -> {name: url}."""
+    agents = {}
+    for item in (part.strip() for part in spec.split(",")):
+        if not item:
+            continue
+        name, _, url = item.partition("=") if "=" in item.split("://", 1)[0] else ("", "", item)
+        agents[name.strip() or urlparse(url).netloc] = url.strip().rstrip("/")
+    return agents
+
+
+# --- Agent Registry ---
+class AgentEndpoint:
+    """One agent: its pooled HTTP client, health and last reported load."""
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.client = None
+        self.healthy = False
+        self.jobs = {"workers": 1, "pending": 0, "running": 0}
+        self.driver = None
+        self.assigned = 0 # commands routed here since the last health probe
+        self.routed = 0
+        self.last_seen = None
+        self.last_error = None
+
+    def score(self):
+        """Load per desktop worker, counting commands the last probe has not seen yet."""
+        jobs = self.jobs
+        return (jobs.get("pending", 0) + jobs.get("running", 0) + self.assigned) / max(1, jobs.get("workers") or 1)
+
+    def mark_down(self, error):
+        self.healthy = False
+        self.last_error = str(error) or type(error).__name__
+
+    def snapshot(self):
+        return {"name": self.name, "url": self.url, "healthy": self.healthy, "driver": self.driver,
+                "score": round(self.score(), 3), "pending": self.jobs.get("pending"), "running": self.jobs.get("running"),
+                "workers": self.jobs.get("workers"), "routed": self.routed, "last_seen": self.last_seen,
+                "last_error": self.last_error}
+
+
+class AgentRegistry:
+    """Known agents plus the job -> agent and user -> agent maps used for routing."""
+
+    def __init__(self, agents, sticky_ttl=STICKY_TTL, health_interval=HEALTH_INTERVAL):
+        self.agents = {name: AgentEndpoint(name, url) for name, url in agents.items()}
+        self.sticky_ttl = sticky_ttl
+        self.health_interval = health_interval
+        self._jobs = OrderedDict()   # job id -> agent name
+        self._sticky = OrderedDict() # user -> (agent name, expires at)
+        self._health_task = None
+
+    async def start(self):
+        limits = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        for agent in self.agents.values():
+            agent.client = httpx.AsyncClient(base_url=agent.url, limits=limits, timeout=REQUEST_TIMEOUT)
+        await self.check_all()
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+        await asyncio.gather(*(agent.client.aclose() for agent in self.agents.values() if agent.client))
+
+    # --- Health ---
+    async def check(self, agent):
+        try:
+            response = await agent.client.get("/", timeout=HEALTH_TIMEOUT)
+            response.raise_for_status()
+            status = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            if agent.healthy:
+                print(f"Router: agent '{agent.name}' is down ({e or type(e).__name__}).")
+            agent.mark_down(e)
+            return
+        if not agent.healthy:
+            print(f"Router: agent '{agent.name}' is up at {agent.url}.")
+        agent.healthy = True
+        agent.jobs = status.get("jobs") or agent.jobs
+        agent.driver = status.get("driver")
+        agent.assigned = 0
+        agent.last_seen = time.time()
+        agent.last_error = None
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(agent) for agent in self.agents.values()))
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check_all()
+
+    # --- Selection ---
+    def candidates(self, target=None, user=None):
+        """Agents to try, best first. Raises HTTPException if none can take the command."""
+        if target is not None:
+            agent = self.agents.get(target)
+            if agent is None:
+                raise HTTPException(status_code=404, detail=f"Unknown agent '{target}'. Known agents: {', '.join(self.agents)}.")
+            if not agent.healthy:
+                raise HTTPException(status_code=503, detail=f"Agent '{target}' is unavailable ({agent.last_error}).")
+            return [agent]
+        healthy = sorted((a for a in self.agents.values() if a.healthy), key=lambda a: (a.score(), a.routed))
+        if not healthy:
+            raise HTTPException(status_code=503, detail="No Terminator agent is available.")
+        sticky = self.sticky_agent(user)
+        if sticky is not None and sticky.healthy:
+            healthy.remove(sticky)
+            healthy.insert(0, sticky)
+        return healthy
+
+    def sticky_agent(self, user):
+        if user is None:
+            return None
+        entry = self._sticky.get(user)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return self.agents.get(entry[0])
+
+    def stick(self, user, agent):
+        if user is None:
+            return
+        self._sticky[user] = (agent.name, time.monotonic() + self.sticky_ttl)
+        self._sticky.move_to_end(user)
+        while len(self._sticky) > MAX_STICKY_USERS:
+            self._sticky.popitem(last=False)
+
+    # --- Job Ownership ---
+    def remember_job(self, job_id, agent):
+        if not job_id:
+            return
+        self._jobs[job_id] = agent.name
+        while len(self._jobs) > MAX_TRACKED_JOBS:
+            self._jobs.popitem(last=False)
+
+    def agent_for_job(self, job_id):
+        name = self._jobs.get(job_id)
+        agent = self.agents.get(name) if name else None
+        if agent is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found (it was not routed by this router).")
+        return agent
+
+    def stats(self):
+        return {"agents": [agent.snapshot() for agent in self.agents.values()],
+                "healthy": sum(1 for agent in self.agents.values() if agent.healthy),
+                "tracked_jobs": len(self._jobs), "sticky_users": len(self._sticky)}
+
+
+registry = AgentRegistry(parse_agents(AGENTS))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await registry.start()
+    yield
+    await registry.stop()
+
+# --- FastAPI Setup ---
+app = FastAPI(
+    title="Terminator Router",
+    description="Routes Terminator Agent commands across several workstations.",
+    version="0.1.0",
+    lifespan=lifespan,
+)
+
+# Same origin policy as the agent (TERMINATOR_CORS_ORIGINS)
+origins = [origin.strip() for origin in os.environ.get(
+    "TERMINATOR_CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",") if origin.strip()]
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials="*" not in origins,
+    allow_methods=["POST", "GET"],
+    allow_headers=["*"],
+    expose_headers=["X-Terminator-Agent", "X-Job-Id", "Retry-After"],
+)
+
+# --- Request Models ---
+class RoutedCommand(BaseModel):
+    """An agent ExecuteCommand plus routing hints; other fields are passed through unchanged."""
+    model_config = ConfigDict(extra="allow")
+    app: str = Field(..., description="The name or alias of the application (e.g., 'notepad', 'chrome')")
+    target: str | None = Field(None, description="Name of the agent that must run the command.")
+    user: str | None = Field(None, max_length=200, description="Routes this user's commands to the same agent while it is healthy.")
+
+class RoutedBatch(BaseModel):
+    """An agent ExecuteBatch plus routing hints; the whole batch runs on one agent."""
+    model_config = ConfigDict(extra="allow")
+    steps: list[dict] = Field(..., min_length=1)
+    target: str | None = None
+    user: str | None = Field(None, max_length=200)
+
+ROUTING_FIELDS = {"target", "user"}
+
+# --- Forwarding ---
+def response_json(response):
+    try:
+        return response.json()
+    except ValueError:
+        return {"detail": response.text}
+
+def agent_response(agent, response, content=None):
+    headers = {"X-Terminator-Agent": agent.name}
+    if "retry-after" in response.headers:
+        headers["Retry-After"] = response.headers["retry-after"]
+    return JSONResponse(status_code=response.status_code,
+                        content=content if content is not None else response_json(response), headers=headers)
+
+async def forward(body, path, target, user, headers=None, timeout=REQUEST_TIMEOUT):
+    """
+    POSTs body to the first agent that accepts it; returns (agent, response).
+
+    Without a target hint, an unreachable or saturated (429) agent is
+    skipped in favour of the next candidate.
+    """
+    rejected = None
+    for agent in registry.candidates(target, user):
+        agent.assigned += 1
+        try:
+            response = await agent.client.post(path, json=body, headers=headers, timeout=timeout)
+        except httpx.TransportError as e:
+            agent.assigned -= 1
+            print(f"Router: agent '{agent.name}' failed on {path} ({e or type(e).__name__}).")
+            agent.mark_down(e)
+            if target is not None:
+                raise HTTPException(status_code=502, detail=f"Agent '{agent.name}' is unreachable: {e}")
+            continue
+        if response.status_code == 429 and target is None:
+            agent.assigned -= 1
+            rejected = rejected or (agent, response)
+            continue
+        agent.routed += 1
+        if response.status_code < 400:
+            registry.stick(user, agent)
+        return agent, response
+    if rejected is not None:
+        return rejected
+    raise HTTPException(status_code=503, detail="No Terminator agent could accept the command.")
+
+def routing(body_target, body_user, header_target, header_user):
+    return body_target or header_target, body_user or header_user
+
+async def proxy_stream(agent, method, path, **kwargs):
+    """Relays an agent's Server-Sent Events stream chunk by chunk."""
+    request = agent.client.build_request(method, path, timeout=httpx.Timeout(REQUEST_TIMEOUT, read=None), **kwargs)
+    try:
+        response = await agent.client.send(request, stream=True)
+    except httpx.TransportError as e:
+        agent.mark_down(e)
+        raise HTTPException(status_code=502, detail=f"Agent '{agent.name}' is unreachable: {e}")
+    if response.status_code != 200:
+        await response.aread()
+        await response.aclose()
+        return agent_response(agent, response)
+    registry.remember_job(response.headers.get("x-job-id"), agent)
+
+    async def relay():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Terminator-Agent": agent.name}
+    if "x-job-id" in response.headers:
+        headers["X-Job-Id"] = response.headers["x-job-id"]
+    return StreamingResponse(relay(), media_type="text/event-stream", headers=headers)
+
+# --- API Endpoints ---
+@app.post("/execute", summary="Route a command to an agent", status_code=202)
+async def execute_action(command: RoutedCommand, idempotency_key: str | None = Header(None),
+                         x_terminator_target: str | None = Header(None), x_terminator_user: str | None = Header(None)):
+    """Same contract as the agent's /execute; the response also names the agent that took the command."""
+    target, user = routing(command.target, command.user, x_terminator_target, x_terminator_user)
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+    agent, response = await forward(command.model_dump(exclude=ROUTING_FIELDS), "/execute", target, user, headers)
+    content = response_json(response)
+    if response.status_code == 202:
+        registry.remember_job(content.get("job_id"), agent)
+        content["agent"] = agent.name
+    return agent_response(agent, response, content)
+
+@app.post("/execute/stream", summary="Route a command and stream its progress")
+async def execute_stream(command: RoutedCommand, idempotency_key: str | None = Header(None),
+                         x_terminator_target: str | None = Header(None), x_terminator_user: str | None = Header(None)):
+    target, user = routing(command.target, command.user, x_terminator_target, x_terminator_user)
+    agent = registry.candidates(target, user)[0]
+    agent.assigned += 1
+    agent.routed += 1
+    registry.stick(user, agent)
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+    return await proxy_stream(agent, "POST", "/execute/stream", json=command.model_dump(exclude=ROUTING_FIELDS),
+                              headers=headers)
+
+@app.post("/execute/batch", summary="Route a batch of commands to one agent")
+async def execute_batch(batch: RoutedBatch, x_terminator_target: str | None = Header(None),
+                        x_terminator_user: str | None = Header(None)):
+    """The whole batch runs on one agent, since its steps hand windows to each other."""
+    target, user = routing(batch.target, batch.user, x_terminator_target, x_terminator_user)
+    agent, response = await forward(batch.model_dump(exclude=ROUTING_FIELDS), "/execute/batch", target, user,
+                                    timeout=None) # a batch answers once every step has finished
+    content = response_json(response)
+    if response.status_code == 200:
+        for step in content.get("steps", []):
+            registry.remember_job(step.get("job_id"), agent)
+        content["agent"] = agent.name
+    return agent_response(agent, response, content)
+
+async def proxy_get(agent, path, params=None, timeout=REQUEST_TIMEOUT):
+    try:
+        response = await agent.client.get(path, params=params, timeout=timeout)
+    except httpx.TransportError as e:
+        agent.mark_down(e)
+        raise HTTPException(status_code=502, detail=f"Agent '{agent.name}' is unreachable: {e}")
+    return agent_response(agent, response)
+
+@app.get("/jobs/{job_id}", summary="Get the status of a routed command")
+async def get_job(job_id: str):
+    return await proxy_get(registry.agent_for_job(job_id), f"/jobs/{job_id}")
+
+@app.get("/jobs/{job_id}/result", summary="Get the result of a routed command")
+async def get_job_result(job_id: str, wait: float = 0.0):
+    wait = min(max(wait, 0.0), MAX_RESULT_WAIT)
+    return await proxy_get(registry.agent_for_job(job_id), f"/jobs/{job_id}/result", params={"wait": wait},
+                           timeout=REQUEST_TIMEOUT + wait)
+
+@app.get("/jobs/{job_id}/events", summary="Stream the progress of a routed command")
+async def stream_job_events(job_id: str, last_event_id: str | None = Header(None)):
+    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+    return await proxy_stream(registry.agent_for_job(job_id), "GET", f"/jobs/{job_id}/events", headers=headers)
+
+@app.get("/agents", summary="Registered agents with health and load")
+async def get_agents():
+    return registry.stats()
+
+# --- Health Check Endpoint ---
+@app.get("/", summary="Health check")
+async def root():
+    stats = registry.stats()
+    return {"message": "Terminator Router is running.", "healthy_agents": stats["healthy"],
+            "agents": len(stats["agents"]), "tracked_jobs": stats["tracked_jobs"]}
+
+# --- Local Stand-in Agents ---
+def start_standins(count, base_port=STANDIN_BASE_PORT):
+    """
+    Starts count terminator_agent processes on the simulated driver, each
+    with its own log and output directory. Returns ({name: url}, processes).
+    """
+    workdir = tempfile.mkdtemp(prefix="terminator-standins-")
+    agents, processes = {}, []
+    for index in range(1, count + 1):
+        port = base_port + index - 1
+        env = dict(os.environ, TERMINATOR_DRIVER="simulated", TERMINATOR_CONSOLE="0",
+                   TERMINATOR_LOG_FILE=os.path.join(workdir, f"standin-{index}.log"),
+                   TERMINATOR_OUTPUT_DIR=os.path.join(workdir, f"standin-{index}-code"))
+        processes.append(subprocess.Popen([sys.executable, AGENT_SCRIPT, "--port", str(port)], env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        agents[f"standin-{index}"] = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + STANDIN_STARTUP_TIMEOUT
+    for name, url in agents.items():
+        while True:
+            try:
+                httpx.get(url + "/", timeout=1.0).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    print(f"Warning: stand-in '{name}' did not come up within {STANDIN_STARTUP_TIMEOUT:.0f}s.")
+                    break
+                time.sleep(0.2)
+    print(f"Started {count} stand-in agents (simulated driver, logs in {workdir}).")
+    return agents, processes
+
+def stop_standins(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Terminator Router")
+    parser.add_argument("--agent", action="append", default=[], metavar="NAME=URL",
+                        help="Register an agent (repeatable; adds to TERMINATOR_AGENTS).")
+    parser.add_argument("--standins", type=int, default=0, metavar="N",
+                        help="Start N local stand-in agents on the simulated driver and route to them.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("TERMINATOR_ROUTER_PORT", "8010")))
+    args = parser.parse_args()
+
+    agents = parse_agents(",".join([AGENTS] + args.agent))
+    standin_processes = []
+    if args.standins:
+        standin_agents, standin_processes = start_standins(args.standins)
+        agents.update(standin_agents)
+    if not agents:
+        print("Error: No agents configured. Set TERMINATOR_AGENTS, pass --agent NAME=URL or --standins N.")
+        sys.exit(1)
+    registry = AgentRegistry(agents)
+    print(f"Starting Terminator Router on http://{args.host}:{args.port} for {len(agents)} agents: {', '.join(agents)}")
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        stop_standins(standin_processes)
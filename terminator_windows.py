@@ -0,0 +1,344 @@
+"""
+Window readiness detection and lookup for the Terminator Agent.
+
+Instead of sleeping a fixed 2.5-3.5 s after launching an app, the agent polls
+for the new window with an adaptive backoff and continues as soon as it can be
+focused. Observed launch latencies are recorded per app alias so the first
+poll can be scheduled close to when the window usually shows up.
+
+Windows are found through a registry keyed by the PID of each spawned
+process, so a lookup does not have to read the title of every top-level
+window; title matching is only the fallback.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from terminator_drivers import get_driver
+from terminator_logging import console
+
+# --- Readiness Settings ---
+# Hard ceiling on how long to wait for a window before falling back to Alt+Tab.
+WINDOW_READY_TIMEOUT = float(os.environ.get("TERMINATOR_WINDOW_TIMEOUT", "10.0"))
+# Without a title to match, only the PID can identify the window, and many
+# launchers hand off to another process; don't wait longer than the old fixed sleep.
+PID_ONLY_READY_TIMEOUT = 3.5
+POLL_INITIAL_INTERVAL = 0.05 # seconds between the first polls
+POLL_MAX_INTERVAL = 0.5      # backoff never sleeps longer than this
+POLL_BACKOFF = 1.5
+# After the spawned process exits, how long to wait for a new window before
+# accepting an existing one (the app handed the launch to its running instance)
+HANDOFF_GRACE = 1.0
+
+# Upper bounds (ms) of the launch latency histogram buckets
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2000, 3500, 5000, 10000)
+
+
+class LaunchLatencyHistogram:
+    """Running per-alias histogram of spawn-to-window-ready latency."""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _entry(self, alias):
+        entry = self._stats.get(alias)
+        if entry is None:
+            entry = {"counts": [0] * (len(self.buckets_ms) + 1), "count": 0, "sum_ms": 0.0, "timeouts": 0}
+            self._stats[alias] = entry
+        return entry
+
+    def observe(self, alias, seconds):
+        latency_ms = seconds * 1000.0
+        with self._lock:
+            entry = self._entry(alias)
+            index = next((i for i, bound in enumerate(self.buckets_ms) if latency_ms <= bound), len(self.buckets_ms))
+            entry["counts"][index] += 1
+            entry["count"] += 1
+            entry["sum_ms"] += latency_ms
+
+    def observe_timeout(self, alias):
+        with self._lock:
+            self._entry(alias)["timeouts"] += 1
+
+    def quantile(self, alias, q):
+        """Approximate quantile in seconds (bucket upper bound), or None if unseen."""
+        with self._lock:
+            entry = self._stats.get(alias)
+            if not entry or not entry["count"]:
+                return None
+            rank = q * entry["count"]
+            seen = 0
+            for index, count in enumerate(entry["counts"]):
+                seen += count
+                if seen >= rank and count:
+                    if index < len(self.buckets_ms):
+                        return self.buckets_ms[index] / 1000.0
+                    return WINDOW_READY_TIMEOUT
+            return None
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for alias, entry in self._stats.items():
+                buckets = {f"le_{bound}ms": count for bound, count in zip(self.buckets_ms, entry["counts"])}
+                buckets["le_inf"] = entry["counts"][-1]
+                result[alias] = {
+                    "count": entry["count"],
+                    "mean_ms": round(entry["sum_ms"] / entry["count"], 1) if entry["count"] else None,
+                    "timeouts": entry["timeouts"],
+                    "buckets": buckets,
+                }
+            return result
+
+
+launch_latency = LaunchLatencyHistogram()
+
+# --- Window Helpers ---
+def window_pid(window):
+    """Returns the owning process id of a window."""
+    hwnd = getattr(window, "_hWnd", None)
+    return get_driver().window_pid(hwnd) if hwnd is not None else None
+
+def is_focusable(window):
+    """A window can take focus once it is visible, restored and has a real size."""
+    try:
+        return bool(window.visible) and not window.isMinimized and window.width > 0 and window.height > 0
+    except Exception:
+        return False
+
+
+class WindowRegistry:
+    """
+    Maps the PIDs of processes the agent spawned to their top-level windows.
+
+    Each refresh enumerates window handles only; the owning PID is looked up
+    once per new handle and cached, and handles that have closed are dropped.
+    The time each handle was first seen is kept so windows that appeared
+    after a spawn can be told apart from ones that were already open.
+    """
+
+    def __init__(self, max_tracked=256):
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._hwnd_pid = {}           # every known top-level hwnd -> owning pid
+        self._hwnd_seen = {}          # every known top-level hwnd -> monotonic time first seen
+        self._tracked_since = {}      # spawned pid -> monotonic time tracking started
+        self._tracked = OrderedDict() # spawned pid -> app alias, oldest first
+        self._pid_hwnds = {}          # spawned pid -> [hwnd, ...] in discovery order
+
+    def track(self, pid, alias):
+        """Starts associating windows with a freshly spawned process."""
+        # Sync first, so every window open before the spawn counts as pre-existing
+        self.refresh()
+        with self._lock:
+            self._tracked[pid] = alias
+            self._tracked.move_to_end(pid)
+            self._tracked_since[pid] = time.monotonic()
+            self._pid_hwnds[pid] = [h for h, owner in self._hwnd_pid.items() if owner == pid]
+            while len(self._tracked) > self.max_tracked:
+                old_pid, _ = self._tracked.popitem(last=False)
+                self._pid_hwnds.pop(old_pid, None)
+                self._tracked_since.pop(old_pid, None)
+
+    def clear(self):
+        """Forgets every window and tracked process (e.g. after switching desktop drivers)."""
+        with self._lock:
+            self._hwnd_pid.clear()
+            self._hwnd_seen.clear()
+            self._tracked.clear()
+            self._tracked_since.clear()
+            self._pid_hwnds.clear()
+
+    def untrack(self, pid):
+        with self._lock:
+            self._tracked.pop(pid, None)
+            self._pid_hwnds.pop(pid, None)
+            self._tracked_since.pop(pid, None)
+
+    def refresh(self):
+        """Incrementally syncs the registry with the current set of windows."""
+        driver = get_driver()
+        handles = driver.window_handles()
+        seen_at = time.monotonic()
+        current = set(handles)
+        with self._lock:
+            for hwnd in [h for h in self._hwnd_pid if h not in current]:
+                owner = self._hwnd_pid.pop(hwnd)
+                self._hwnd_seen.pop(hwnd, None)
+                if owner in self._pid_hwnds and hwnd in self._pid_hwnds[owner]:
+                    self._pid_hwnds[owner].remove(hwnd)
+            for hwnd in handles:
+                if hwnd in self._hwnd_pid:
+                    continue
+                owner = driver.window_pid(hwnd)
+                self._hwnd_pid[hwnd] = owner
+                self._hwnd_seen[hwnd] = seen_at
+                if owner in self._tracked:
+                    self._pid_hwnds[owner].append(hwnd)
+
+    def handles_for_pid(self, pid):
+        """All known window handles owned by pid, newest last."""
+        with self._lock:
+            return list(self._pid_hwnds.get(pid, ()))
+
+    def windows_for_pid(self, pid):
+        """Focusable windows owned by pid, newest last."""
+        driver = get_driver()
+        windows = [driver.window(hwnd) for hwnd in self.handles_for_pid(pid)]
+        return [window for window in windows if is_focusable(window)]
+
+    def tracked_pids(self):
+        with self._lock:
+            return set(self._tracked)
+
+    def appeared_since_spawn(self, pid, hwnd):
+        """
+        True if hwnd was first seen after pid started being tracked, None if
+        pid is not tracked (nothing to compare against).
+        """
+        with self._lock:
+            since = self._tracked_since.get(pid)
+            if since is None:
+                return None
+            seen = self._hwnd_seen.get(hwnd)
+            return seen is not None and seen > since
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "known_windows": len(self._hwnd_pid),
+                "tracked": {str(pid): {"alias": alias, "windows": len(self._pid_hwnds.get(pid, ()))}
+                            for pid, alias in self._tracked.items()},
+            }
+
+
+window_registry = WindowRegistry()
+
+def restore_windows(pid):
+    """Un-minimizes the windows of a process (e.g. a warm instance started minimized)."""
+    window_registry.refresh()
+    restored = 0
+    for hwnd in window_registry.handles_for_pid(pid):
+        try:
+            window = get_driver().window(hwnd)
+            if window.isMinimized:
+                window.restore()
+                restored += 1
+        except Exception as e:
+            console(f"Could not restore window {hwnd} of PID {pid}: {e}")
+    return restored
+
+def find_window(title=None, pid=None, refresh=True, handed_off=False):
+    """
+    Looks up a focusable window for the spawned process.
+
+    Queries the PID registry first; falls back to a title search. For a
+    process the agent just spawned, a title match only counts if the window
+    appeared after the spawn, so an earlier instance of the same app is never
+    mistaken for the new one. Single-instance apps (Chrome, VS Code, Office)
+    open a relaunch's window inside their first process, so the owner may be
+    another spawned process; among several new windows, ones owned by
+    processes the agent did not spawn (a launcher's handoff) win ties.
+
+    handed_off means the spawned process exited and no new window showed up,
+    e.g. Notepad opening the file as a tab of its existing window; then an
+    existing window is accepted like for a title-only lookup, where windows
+    owned by any process the agent spawned are preferred.
+    """
+    if refresh:
+        window_registry.refresh()
+    if pid is not None:
+        windows = window_registry.windows_for_pid(pid)
+        if windows:
+            return windows[-1]
+    if not title:
+        return None
+    candidates = [window for window in get_driver().windows_with_title(title) if is_focusable(window)]
+    if not candidates:
+        return None
+    tracked = window_registry.tracked_pids()
+    if pid in tracked:
+        new = [window for window in candidates
+               if window_registry.appeared_since_spawn(pid, getattr(window, "_hWnd", None))]
+        if new:
+            return next((window for window in new if window_pid(window) not in tracked), new[-1])
+        if not handed_off:
+            return None
+    for window in candidates:
+        if window_pid(window) in tracked:
+            return window
+    return candidates[0]
+
+def is_launch_window(window, pid):
+    """True if window can be attributed to the launch of pid (for latency stats)."""
+    if pid is None:
+        return False
+    if window_pid(window) == pid:
+        return True
+    return bool(window_registry.appeared_since_spawn(pid, getattr(window, "_hWnd", None)))
+
+def wait_for_window(app_alias, title=None, pid=None, started_at=None, timeout=None, record=True, process=None):
+    """
+    Polls for the app's window with adaptive backoff until it is focusable.
+
+    Returns the window, or None once the ceiling is hit. The spawn-to-ready
+    latency is recorded in launch_latency under app_alias unless record is
+    False (e.g. when waiting on an instance that was already running). Only
+    windows that belong to this launch are recorded: ones owned by pid or
+    that appeared after it was spawned, never a pre-existing title match.
+    process (the spawned Popen) lets a handoff to an existing window be noticed.
+    """
+    if not title and pid is None:
+        return None
+    started_at = started_at or time.monotonic()
+    if timeout is None:
+        timeout = WINDOW_READY_TIMEOUT if title else min(WINDOW_READY_TIMEOUT, PID_ONLY_READY_TIMEOUT)
+    deadline = started_at + timeout
+
+    # Skip polling while the window almost certainly is not there yet: half
+    # of the fastest launch we typically see for this app.
+    typical = launch_latency.quantile(app_alias, 0.1) if record else None
+    if typical:
+        head_start = started_at + typical / 2 - time.monotonic()
+        if head_start > 0:
+            time.sleep(min(head_start, max(0.0, deadline - time.monotonic())))
+
+    interval = POLL_INITIAL_INTERVAL
+    exited_at = None
+    while True:
+        try:
+            if exited_at is None and process is not None and process.poll() is not None:
+                exited_at = time.monotonic()
+            handed_off = exited_at is not None and time.monotonic() - exited_at >= HANDOFF_GRACE
+            window = find_window(title, pid, handed_off=handed_off)
+        except Exception as e:
+            console(f"Error while polling for window '{title}': {e}")
+            window = None
+        if window is not None:
+            if record and is_launch_window(window, pid):
+                launch_latency.observe(app_alias, time.monotonic() - started_at)
+            return window
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if record:
+                launch_latency.observe_timeout(app_alias)
+            return None
+        time.sleep(min(interval, remaining))
+        interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+
+def wait_until_active(window, timeout=0.5):
+    """Waits briefly for an activated window to actually receive focus."""
+    deadline = time.monotonic() + timeout
+    interval = 0.02
+    while time.monotonic() < deadline:
+        try:
+            if window.isActive:
+                return True
+        except Exception:
+            return False
+        time.sleep(interval)
+        interval = min(interval * 2, 0.1)
+    return False
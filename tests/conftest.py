@@ -0,0 +1,60 @@
+"""
+Shared fixtures: the agent runs in-process against the simulated desktop
+driver, with its log and saved files in a scratch directory.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix="terminator_tests_")
+
+# Must be set before any terminator module is imported
+os.environ["TERMINATOR_DRIVER"] = "simulated"
+os.environ["TERMINATOR_CONSOLE"] = "0"
+os.environ.setdefault("TERMINATOR_LOG_FILE", os.path.join(SCRATCH, "terminator_log.txt"))
+os.environ.setdefault("TERMINATOR_OUTPUT_DIR", os.path.join(SCRATCH, "generated_code"))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def agent():
+    import terminator_agent
+    terminator_agent.job_engine.start()
+    terminator_agent.resolver.start_background_refresh()
+    assert terminator_agent.resolver.wait_ready(10)
+    yield terminator_agent
+    terminator_agent.job_engine.stop()
+    terminator_agent.resolver.stop_background_refresh()
+
+
+@pytest.fixture
+def desktop(agent):
+    """Factory for a fresh simulated desktop: desktop(**SimulatedDriver options)."""
+    from terminator_drivers import create_driver, set_driver
+    from terminator_windows import window_registry
+
+    def install(**options):
+        options.setdefault("titles", agent.simulated_titles())
+        options.setdefault("jitter", 0)
+        driver = create_driver("simulated", **options)
+        set_driver(driver)
+        window_registry.clear()
+        return driver
+
+    return install
+
+
+def run_commands(agent, *commands):
+    """Submits ExecuteCommand kwargs together and waits for all of them."""
+    jobs = [agent.submit_command(agent.ExecuteCommand(**command)) for command in commands]
+    for job in jobs:
+        assert job.done.wait(30), f"job for {job.description} did not finish"
+    return jobs
+
+
+def window_texts(driver):
+    """{pid: text} of every simulated window, in creation order."""
+    return {window.pid: window.text for window in driver._windows.values()}
@@ -0,0 +1,60 @@
+"""End-to-end command runs against the simulated desktop."""
+from conftest import run_commands, window_texts
+
+
+def test_commands_for_different_windows_do_not_interleave(agent, desktop):
+    driver = desktop()
+    notepad, word = run_commands(
+        agent,
+        {"app": "notepad", "action": "N" * 300, "typing_mode": "human"},
+        {"app": "ms word", "action": "W" * 300, "typing_mode": "human"},
+    )
+    assert notepad.state == word.state == "succeeded"
+    assert sorted(window_texts(driver).values()) == ["N" * 300, "W" * 300]
+
+
+def test_window_appearing_mid_typing_does_not_take_the_keys(agent, desktop):
+    # Word's window shows up (and takes the foreground) while Notepad is being typed into
+    driver = desktop(char_latency=0.005, launch_latency={"notepad": 0.1, "winword": 0.6, "default": 0.3})
+    run_commands(
+        agent,
+        {"app": "notepad", "action": "N" * 300, "typing_mode": "human"},
+        {"app": "ms word", "action": "W" * 300, "typing_mode": "human"},
+    )
+    texts = {window.title: window.text for window in driver._windows.values()}
+    assert texts == {"Notepad": "N" * 300, "Word": "W" * 300}
+
+
+def test_second_launch_types_into_its_own_instance(agent, desktop):
+    driver = desktop()
+    for text in ("first", "second"):
+        job, = run_commands(agent, {"app": "notepad", "action": text, "save_mode": "off"})
+        assert job.state == "succeeded"
+    assert list(window_texts(driver).values()) == ["first", "second"]
+
+
+def test_single_instance_relaunch_finds_window_in_first_process(agent, desktop):
+    driver = desktop(single_instance={"chrome": "window"})
+    for text in ("first", "second"):
+        job, = run_commands(agent, {"app": "chrome", "action": text, "typing_mode": "human"})
+        assert job.state == "succeeded"
+        assert job.started_at and job.finished_at - job.started_at < 3.0 # no readiness timeout
+    windows = list(driver._windows.values())
+    assert [window.text for window in windows] == ["first", "second"]
+    assert windows[0].pid == windows[1].pid
+
+
+def test_tab_handoff_types_into_existing_window(agent, desktop):
+    driver = desktop(single_instance={"notepad": "tab"})
+    for text in ("first", "second"):
+        job, = run_commands(agent, {"app": "notepad", "action": text, "save_mode": "off"})
+        assert job.state == "succeeded"
+    assert list(window_texts(driver).values()) == ["firstsecond"]
+
+
+def test_synonyms_and_fuzzy_names_share_a_lane(agent):
+    def lane(app):
+        return agent.command_target(agent.ExecuteCommand(app=app))
+
+    assert lane("code") == lane("vscode")
+    assert lane("calculatr") == lane("calculator")
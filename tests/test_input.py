@@ -0,0 +1,60 @@
+"""Text injection against the simulated desktop."""
+import pytest
+
+import terminator_input
+from terminator_drivers import ClipboardError, SimulatedDriver, set_driver
+
+
+class FlakyClipboardDriver(SimulatedDriver):
+    """Simulated desktop whose clipboard stops accepting text after a few writes."""
+
+    def __init__(self, working_writes, **options):
+        super().__init__(**options)
+        self.working_writes = working_writes
+
+    def clipboard_set(self, text):
+        if self.working_writes <= 0:
+            raise ClipboardError("clipboard is locked by another process")
+        self.working_writes -= 1
+        super().clipboard_set(text)
+
+
+@pytest.fixture
+def notepad():
+    def open_window(driver):
+        set_driver(driver)
+        driver.spawn("notepad.exe")
+        return driver.active_window
+
+    return open_window
+
+
+def test_clipboard_failure_midway_types_only_the_rest(notepad, monkeypatch):
+    monkeypatch.setattr(terminator_input.paste_bulk, "__defaults__", (10, None, None))
+    window = notepad(FlakyClipboardDriver(working_writes=2, launch_latency=0, jitter=0, char_latency=0))
+    text = "".join(chr(ord("a") + i % 26) for i in range(45))
+    reported = []
+
+    result = terminator_input.inject_text(text, mode=terminator_input.TYPING_MODE_BULK,
+                                          progress=lambda done, total: reported.append(done))
+
+    assert window.text == text
+    assert result["pasted_chars"] == 20
+    assert reported[:2] == [10, 20] and reported[-1] == len(text)
+    assert reported == sorted(reported)
+
+
+def test_focus_callback_runs_before_every_key(notepad):
+    window = notepad(SimulatedDriver(launch_latency=0, jitter=0, char_latency=0))
+    calls = []
+
+    terminator_input.type_human("hello", focus=lambda: calls.append(window.text))
+
+    assert window.text == "hello"
+    assert calls == ["", "h", "he", "hel", "hell"]
+
+
+def test_paste_settle_grows_with_chunk_size():
+    small = terminator_input.paste_settle_seconds("x" * 1024)
+    large = terminator_input.paste_settle_seconds("x" * 16 * 1024)
+    assert terminator_input.PASTE_SETTLE_SECONDS < small < large
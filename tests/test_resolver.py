@@ -0,0 +1,45 @@
+"""App resolver index: lookups and rebuilds."""
+import os
+import stat
+import time
+
+from terminator_resolver import AppResolver
+
+
+def make_executable(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+
+def test_invalidate_rebuilds_without_waiting_for_the_interval(tmp_path):
+    name = "mytool.exe" if os.name == "nt" else "mytool"
+    resolver = AppResolver({}, search_roots=[str(tmp_path / "apps")],
+                           cache_path=str(tmp_path / "index.json"), refresh_interval=600)
+    resolver.start_background_refresh()
+    try:
+        assert resolver.wait_ready(10)
+        assert resolver.resolve("mytool") is None
+        built_at = resolver.stats()["built_at"]
+
+        make_executable(str(tmp_path / "apps" / "MyTool" / name))
+        resolver.invalidate()
+        deadline = time.monotonic() + 5
+        while resolver.stats()["built_at"] == built_at and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        assert resolver.resolve("mytool").path.endswith(name)
+    finally:
+        resolver.stop_background_refresh()
+
+
+def test_synonyms_win_and_typos_resolve_fuzzily():
+    resolver = AppResolver({"visual studio code": r"C:\Code\Code.exe", "calculator": r"C:\Windows\calc.exe"},
+                           synonyms={"code": "visual studio code"},
+                           static_index={"visual studio code": r"C:\Code\Code.exe", "calculator": r"C:\Windows\calc.exe",
+                                         "code": r"C:\Other\code.exe"})
+    resolver.build()
+    assert resolver.resolve("code") == (r"C:\Code\Code.exe", "visual studio code", "synonym")
+    assert resolver.resolve("calculatr").alias == "calculator"
+    assert resolver.resolve("does not exist") is None
@@ -0,0 +1,33 @@
+"""VAPI actions against a simulated Terminator server."""
+import time
+
+import pytest
+
+import vapi_terminator_integration as vapi
+from terminator_drivers import SimulatedTerminatorClient
+from vapi_terminator_client import TerminatorClientPool
+
+
+@pytest.fixture
+def server(monkeypatch):
+    client = SimulatedTerminatorClient(latency=0.2)
+    pool = TerminatorClientPool(factory=lambda: client, size=4, probe=lambda: True)
+    monkeypatch.setattr(vapi, "terminator_pool", pool)
+    yield client
+    pool.stop_health_monitor()
+
+
+def test_multiple_urls_open_over_the_pool(server):
+    urls = [f"https://example.com/{i}" for i in range(5)]
+    started = time.monotonic()
+    assert vapi.open_urls_terminator(", ".join(urls))
+    elapsed = time.monotonic() - started
+
+    assert sorted(server.calls) == sorted(("open_url", url) for url in urls)
+    assert server.calls[0] == ("open_url", urls[0])
+    assert elapsed < 0.2 * 3 # first URL, then the other four side by side
+
+
+def test_single_url_or_domain_is_opened_as_is(server):
+    assert vapi.open_urls_terminator("github.com")
+    assert server.calls == [("open_url", "github.com")]
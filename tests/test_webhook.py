@@ -0,0 +1,28 @@
+"""VAPI webhook authentication."""
+import pytest
+from fastapi.testclient import TestClient
+
+import vapi_webhook_server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(vapi_webhook_server, "WEBHOOK_SECRET", "s3cret")
+    return TestClient(vapi_webhook_server.app)
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Vapi-Secret": "wrong"}, {"X-Vapi-Secret": "s3cre"}])
+def test_webhook_rejects_missing_or_wrong_secret(client, headers):
+    assert client.post("/vapi/webhook", json={}, headers=headers).status_code == 401
+
+
+def test_webhook_accepts_matching_secret(client):
+    response = client.post("/vapi/webhook", json={}, headers={"X-Vapi-Secret": "s3cret"})
+    assert response.status_code == 202
+    assert response.json()["status"] == "ignored"
+
+
+@pytest.mark.parametrize("host, loopback", [("127.0.0.1", True), ("::1", True), ("localhost", True),
+                                            ("0.0.0.0", False), ("192.168.1.20", False), ("example.com", False)])
+def test_is_loopback(host, loopback):
+    assert vapi_webhook_server.is_loopback(host) is loopback
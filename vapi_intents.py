@@ -0,0 +1,196 @@
+"""
+Precompiled intent dispatcher for VAPI structuredData.
+
+Intents are declared in a table (INTENTS) instead of an if/elif chain. Each
+intent names the action to run, which structuredData fields must be present
+or absent, and at most one trigger field matched by prefix, regex and/or
+keyword rules. At startup the table is compiled per field shape (which
+fields are present): prefix and regex rules of each trigger field become one
+anchored regex whose alternatives are tried in table order inside a single
+re.match call, and keyword rules become a word -> intent hash table probed
+with the words of the field. Routing an event therefore costs one tokenize
+plus a few dict lookups and C-level regex matches, instead of one Python
+string scan per rule.
+
+Micro-benchmark:  python vapi_intents.py --bench
+"""
+import argparse
+import re
+import timeit
+from collections import namedtuple
+
+FIELDS = ("appName", "searchQuery")
+WORD_RE = re.compile(r"\w+")
+
+Intent = namedtuple(
+    "Intent",
+    ["name", "action", "argument", "description", "trigger_field", "prefixes", "regex", "keywords",
+     "requires", "forbids"],
+)
+
+def intent(name, action, argument, description, trigger_field=None, prefixes=(), regex=None, keywords=(),
+           requires=(), forbids=()):
+    """
+    Declares an intent.
+
+    - argument: structuredData field passed to the action
+    - trigger_field: "summary" or a structuredData field the rules are matched against
+    - prefixes: the field starts with one of these strings
+    - regex: matched at the start of the field (prefix with .* to search)
+    - keywords: case-insensitive whole words anywhere in the field (single words)
+    Rules of one intent are alternatives; an intent without rules always
+    matches once requires/forbids hold. Earlier intents win.
+    """
+    return Intent(name, action, argument, description, trigger_field, tuple(prefixes), regex, tuple(keywords),
+                  frozenset(requires), frozenset(forbids))
+
+# --- Intent Table ---
+INTENTS = [
+    intent("open_app", "open_application", "appName", "Open application '{arg}'",
+           requires={"appName"}, forbids={"searchQuery"}),
+    # A URL, or a first word that looks like a domain (e.g. "github.com trending")
+    intent("open_url", "open_url", "searchQuery", "Open URL '{arg}'",
+           trigger_field="searchQuery", prefixes=("http://", "https://"), regex=r"[^ ]*\.",
+           requires={"searchQuery"}),
+    intent("type_text", "type_text", "searchQuery", "Type text '{arg}'",
+           trigger_field="summary", keywords=("type", "typing", "write", "writing"),
+           requires={"searchQuery"}),
+    intent("web_search", "search_web", "searchQuery", "Search web for '{arg}'",
+           requires={"searchQuery"}),
+]
+
+
+def _rule_pattern(item):
+    alternatives = [re.escape(prefix) for prefix in item.prefixes]
+    if item.regex:
+        alternatives.append(f"(?:{item.regex})")
+    return "|".join(alternatives)
+
+
+class IntentDispatcher:
+    """Routes (structuredData, summary) to the first matching intent of a compiled table."""
+
+    def __init__(self, intents=INTENTS):
+        self.intents = list(intents)
+        self._group_to_index = {}
+        # (appName present, searchQuery present) ->
+        #   (fallback index or None, [(field, compiled regex)], [(field, {word: index})])
+        self._routes = {}
+        for bits in ((a, q) for a in (False, True) for q in (False, True)):
+            shape = frozenset(field for field, on in zip(FIELDS, bits) if on)
+            fallback = None
+            patterns = {} # trigger field -> [named alternatives, in table order]
+            keywords = {} # trigger field -> {lowercase word: first intent index}
+            for index, item in enumerate(self.intents):
+                if not item.requires <= shape or item.forbids & shape:
+                    continue
+                group = f"i{index}"
+                self._group_to_index[group] = index
+                pattern = _rule_pattern(item)
+                if pattern:
+                    patterns.setdefault(item.trigger_field, []).append(f"(?P<{group}>{pattern})")
+                for word in item.keywords:
+                    keywords.setdefault(item.trigger_field, {}).setdefault(word.lower(), index)
+                if not pattern and not item.keywords and fallback is None:
+                    fallback = index
+            matchers = [(field, re.compile("|".join(alternatives), re.DOTALL))
+                        for field, alternatives in patterns.items()]
+            self._routes[bits] = (fallback, matchers, list(keywords.items()))
+
+    def match(self, structured_data, summary=""):
+        """Returns (intent, argument) for the event, or (None, None) if nothing applies."""
+        app_name = structured_data.get("appName")
+        search_query = structured_data.get("searchQuery")
+        fallback, matchers, keywords = self._routes[(bool(app_name), bool(search_query))]
+        values = {"appName": app_name, "searchQuery": search_query, "summary": summary}
+        best = fallback
+        for field, compiled in matchers:
+            value = values[field]
+            if not value:
+                continue
+            found = compiled.match(value)
+            if found is not None:
+                index = self._group_to_index[found.lastgroup]
+                if best is None or index < best:
+                    best = index
+        for field, table in keywords:
+            value = values[field]
+            if not value:
+                continue
+            for word in WORD_RE.findall(value.lower()):
+                index = table.get(word)
+                if index is not None and (best is None or index < best):
+                    best = index
+        if best is None:
+            return None, None
+        chosen = self.intents[best]
+        return chosen, values[chosen.argument]
+
+
+dispatcher = IntentDispatcher()
+
+
+# --- Micro-Benchmark ---
+BENCH_EVENTS = [
+    ({"appName": "notepad", "searchQuery": None}, "User wants to open Notepad"),
+    ({"appName": None, "searchQuery": "https://github.com"}, "User wants to go to GitHub"),
+    ({"appName": None, "searchQuery": "github.com trending"}, "User wants GitHub trending"),
+    ({"appName": None, "searchQuery": "Happy Birthday"}, "User wants to type Happy Birthday"),
+    ({"appName": None, "searchQuery": "cute cat videos"}, "User wants to search for cute cat videos"),
+    ({"appName": None, "searchQuery": None}, "User asked about the weather"),
+]
+
+def legacy_route(structured_data, summary, extra_keywords=()):
+    """The original if/elif chain from process_vapi_data, plus one elif per extra keyword intent."""
+    app_name = structured_data.get("appName")
+    search_query = structured_data.get("searchQuery")
+    if app_name and not search_query:
+        return "open_application"
+    elif search_query:
+        if search_query.startswith("http://") or search_query.startswith("https://") or "." in search_query.split(" ")[0]:
+            return "open_url"
+        elif "type" in summary.lower() or "write" in summary.lower():
+            return "type_text"
+        for keyword in extra_keywords:
+            if keyword in summary.lower():
+                return keyword
+        return "search_web"
+    return None
+
+def synthetic_keywords(count):
+    return [f"zqx{n}word" for n in range(count)]
+
+def synthetic_intents(count):
+    """count extra keyword intents ahead of the built-in web search fallback."""
+    extra = [intent(f"synthetic_{n}", "search_web", "searchQuery", "Synthetic '{arg}'",
+                    trigger_field="summary", keywords=(keyword,), requires={"searchQuery"})
+             for n, keyword in enumerate(synthetic_keywords(count))]
+    return INTENTS[:-1] + extra + INTENTS[-1:]
+
+def benchmark(rounds=20000, sizes=(0, 100, 500)):
+    """Dispatch cost per event for if/elif chains and compiled tables of growing size."""
+    events = BENCH_EVENTS
+    per_event = lambda seconds: seconds / (rounds * len(events)) * 1e6
+    print(f"{'extra intents':<15}{'if/elif us/event':>18}{'compiled us/event':>19}")
+    for size in sizes:
+        keywords = synthetic_keywords(size)
+        table = IntentDispatcher(synthetic_intents(size))
+        legacy = timeit.timeit(lambda: [legacy_route(d, s, keywords) for d, s in events], number=rounds)
+        compiled = timeit.timeit(lambda: [table.match(d, s) for d, s in events], number=rounds)
+        print(f"{size:<15}{per_event(legacy):>18.2f}{per_event(compiled):>19.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VAPI intent dispatcher.")
+    parser.add_argument("--bench", action="store_true", help="Run the dispatch micro-benchmark.")
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args(argv)
+    if args.bench:
+        benchmark(args.rounds)
+        return
+    for data, summary in BENCH_EVENTS:
+        chosen, argument = dispatcher.match(data, summary)
+        print(f"{summary!r:<48} -> {chosen.name if chosen else None} ({argument!r})")
+
+
+if __name__ == "__main__":
+    main()
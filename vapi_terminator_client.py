@@ -0,0 +1,270 @@
+"""
+Lazy, pooled and self-healing connection to the Terminator server.
+
+The DesktopUseClient used to be created once at import time, so a Terminator
+server that was down at that moment disabled Terminator actions for the life
+of the process. Here clients are created on first use, kept in a small pool,
+and guarded by a circuit breaker: after repeated connection failures calls
+fail fast, and a background health check probes the server with exponential
+backoff and closes the circuit again once it is back.
+"""
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+# --- Connection Settings ---
+# Address the clients connect to and the health check probes, so both watch the same server
+SERVER_ADDRESS = os.environ.get("TERMINATOR_SERVER_ADDR", "127.0.0.1:3000")
+POOL_SIZE = int(os.environ.get("TERMINATOR_CLIENT_POOL_SIZE", "2"))
+HEALTH_INTERVAL = float(os.environ.get("TERMINATOR_HEALTH_INTERVAL", "10"))
+FAILURE_THRESHOLD = 3    # consecutive connection failures that open the circuit
+BASE_BACKOFF = 1.0       # seconds before the first reconnection attempt
+MAX_BACKOFF = 60.0
+ACQUIRE_TIMEOUT = 10.0   # seconds to wait for a free pooled client
+PROBE_TIMEOUT = 1.0
+
+# --- Circuit States ---
+CIRCUIT_CLOSED = "closed"       # calls go through
+CIRCUIT_OPEN = "open"           # calls fail fast until the backoff expires
+CIRCUIT_HALF_OPEN = "half_open" # one trial call/probe decides
+
+
+class CircuitOpenError(Exception):
+    """The Terminator server is considered down; the call was not attempted."""
+
+
+class ClientUnavailable(Exception):
+    """No Terminator client can be created (e.g. desktop-use is not installed)."""
+
+
+class CircuitBreaker:
+    """Tracks connection failures and decides whether calls may be attempted."""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, base_backoff=BASE_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.backoff = base_backoff
+        self.retry_at = None
+        self.opened_at = None
+        self.last_error = None
+
+    def allow(self):
+        """True if a call may be attempted now; an expired open circuit lets one trial through."""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            if self.state == CIRCUIT_OPEN and time.monotonic() >= self.retry_at:
+                self.state = CIRCUIT_HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                print("Terminator connection restored; circuit closed.")
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self.backoff = self.base_backoff
+            self.retry_at = None
+            self.opened_at = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CIRCUIT_OPEN:
+                    self.opened_at = self.opened_at or time.time()
+                self.state = CIRCUIT_OPEN
+                self.retry_at = time.monotonic() + self.backoff
+                print(f"Terminator connection failing ({self.last_error}); retrying in {self.backoff:.1f}s.")
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def seconds_until_retry(self):
+        with self._lock:
+            if self.state != CIRCUIT_OPEN:
+                return 0.0
+            return max(0.0, self.retry_at - time.monotonic())
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "next_backoff_seconds": self.backoff,
+                "retry_in_seconds": round(max(0.0, self.retry_at - time.monotonic()), 2) if self.retry_at else None,
+                "opened_at": self.opened_at,
+                "last_error": self.last_error,
+            }
+
+
+def _default_factory():
+    from desktop_use import DesktopUseClient # imported on first use, not at startup
+    return DesktopUseClient(base_url=SERVER_ADDRESS)
+
+def probe_server(address=SERVER_ADDRESS, timeout=PROBE_TIMEOUT):
+    """Cheap health check: can a TCP connection to the Terminator server be opened?"""
+    host, _, port = address.rpartition(":")
+    try:
+        with socket.create_connection((host or "127.0.0.1", int(port)), timeout=timeout):
+            return True
+    except (OSError, ValueError):
+        return False
+
+
+class TerminatorClientPool:
+    """
+    A small pool of DesktopUseClient sessions behind a circuit breaker.
+
+    api_errors are exceptions meaning the server answered but rejected the
+    request; they leave the connection (and the circuit) healthy. Any other
+    exception from a call discards that client and counts as a connection failure.
+    api_errors may also be a callable returning them, resolved on the first call,
+    so the client library is not imported until it is needed.
+    """
+
+    def __init__(self, factory=None, size=POOL_SIZE, api_errors=(), probe=probe_server,
+                 health_interval=HEALTH_INTERVAL, breaker=None):
+        self.factory = factory or _default_factory
+        self.size = max(1, size)
+        self._api_errors = api_errors
+        self.probe = probe
+        self.health_interval = health_interval
+        self.breaker = breaker or CircuitBreaker()
+        self.unavailable_reason = None
+        self._idle = deque()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._calls = 0
+        self._stop = threading.Event()
+        self._monitor = None
+
+    @property
+    def api_errors(self):
+        if callable(self._api_errors):
+            self._api_errors = self._api_errors()
+        return tuple(self._api_errors)
+
+    # --- Availability ---
+    def available(self):
+        """False if no client can ever be created or the circuit is open."""
+        return self.unavailable_reason is None and self.breaker.state != CIRCUIT_OPEN
+
+    # --- Calls ---
+    def call(self, method, *args, **kwargs):
+        """
+        Runs client.<method>(*args) on a pooled client.
+
+        Raises ClientUnavailable, CircuitOpenError, or whatever the client raised.
+        """
+        if self.unavailable_reason is not None:
+            raise ClientUnavailable(self.unavailable_reason)
+        self.start_health_monitor()
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Terminator server unavailable; next retry in {self.breaker.seconds_until_retry():.0f}s.")
+        if not self._slots.acquire(timeout=ACQUIRE_TIMEOUT):
+            raise TimeoutError("No pooled Terminator client became free in time.")
+        try:
+            client = self._checkout()
+            try:
+                result = getattr(client, method)(*args, **kwargs)
+            except self.api_errors:
+                self._checkin(client) # the server answered, the session is fine
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                self._discard()
+                self.breaker.record_failure(e)
+                raise
+            self._checkin(client)
+            self.breaker.record_success()
+            return result
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        with self._lock:
+            self._calls += 1
+            if self._idle:
+                return self._idle.pop()
+        try:
+            client = self.factory()
+        except ImportError as e:
+            self.unavailable_reason = f"desktop-use library not installed ({e})"
+            raise ClientUnavailable(self.unavailable_reason) from e
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        with self._lock:
+            self._created += 1
+        return client
+
+    def _checkin(self, client):
+        with self._lock:
+            self._idle.append(client)
+
+    def _discard(self):
+        with self._lock:
+            self._created -= 1
+
+    def reset(self):
+        """Drops idle sessions, e.g. after the server restarted."""
+        with self._lock:
+            self._created -= len(self._idle)
+            self._idle.clear()
+
+    # --- Health Checks ---
+    def start_health_monitor(self):
+        if self._monitor is not None or self.probe is None:
+            return
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._stop.clear()
+            self._monitor = threading.Thread(target=self._health_loop, name="terminator-health", daemon=True)
+            self._monitor.start()
+
+    def stop_health_monitor(self):
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=2.0)
+            self._monitor = None
+
+    def check_health(self):
+        """Probes the server once and updates the circuit. Returns True if it is reachable."""
+        if self.breaker.state == CIRCUIT_OPEN and not self.breaker.allow():
+            return False # still backing off
+        healthy = self.probe()
+        if healthy:
+            if self.breaker.state != CIRCUIT_CLOSED:
+                self.reset() # sessions from before the outage may be stale
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure("health probe failed")
+        return healthy
+
+    def _health_loop(self):
+        while True:
+            # While the circuit is open, wake up when the backoff expires
+            wait = self.health_interval
+            if self.breaker.state == CIRCUIT_OPEN:
+                wait = min(wait, self.breaker.seconds_until_retry())
+            if self._stop.wait(max(wait, 0.05)):
+                return
+            try:
+                self.check_health()
+            except Exception as e:
+                print(f"Terminator health check failed: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            pool = {"size": self.size, "created": self._created, "idle": len(self._idle), "calls": self._calls}
+        return {"available": self.available(), "unavailable_reason": self.unavailable_reason,
+                "pool": pool, "circuit": self.breaker.snapshot()}
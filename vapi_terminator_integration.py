@@ -1,32 +1,35 @@
 import json
 import sys
 import webbrowser # Using webbrowser as a fallback/alternative for simple URL opening
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 
-# Attempt to import the Terminator client library
-# Make sure you have installed it: pip install desktop-use
-try:
-    from desktop_use import DesktopUseClient, ApiError
-    # Initialize the client (assumes Terminator server is running on 127.0.0.1:3000)
-    terminator_client = DesktopUseClient()
-    TERMINATOR_AVAILABLE = True
-    print("Terminator client initialized successfully.")
-except ImportError:
-    print("Warning: desktop-use library not found. Terminator actions will be skipped.")
-    print("Install it using: pip install desktop-use")
-    TERMINATOR_AVAILABLE = False
-    terminator_client = None
-except Exception as e:
-    print(f"Warning: Could not connect to Terminator server: {e}")
-    print("Make sure the Terminator server application is running.")
-    TERMINATOR_AVAILABLE = False
-    terminator_client = None
+from terminator_browser import search_url, url_list
+from vapi_intents import dispatcher as intent_dispatcher
+from vapi_terminator_client import CircuitOpenError, ClientUnavailable, TerminatorClientPool
+
+# The Terminator client library (pip install desktop-use) is only imported once
+# an action runs; clients are created lazily and pooled, and a circuit breaker
+# plus background health checks reconnect after a Terminator server restart.
+def api_errors():
+    """(desktop_use.ApiError,), imported on first use; empty without desktop-use."""
+    try:
+        from desktop_use import ApiError
+    except ImportError:
+        return ()
+    return (ApiError,)
+
+terminator_pool = TerminatorClientPool(api_errors=api_errors)
+
+def terminator_available():
+    """True unless desktop-use is missing or the Terminator server is known to be down."""
+    return terminator_pool.available()
 
 # --- Terminator Action Functions ---
 
 def open_application_terminator(app_name):
     """Uses Terminator to open an application by its name."""
-    if not TERMINATOR_AVAILABLE:
+    if not terminator_available():
         print(f"Skipping Terminator action: Open application '{app_name}'")
         return False
 
@@ -34,10 +37,13 @@ def open_application_terminator(app_name):
     try:
         # Note: The 'app_name' might need to be the executable name (e.g., 'calc', 'notepad')
         # or a more specific path depending on the application and OS.
-        terminator_client.open_application(app_name)
+        terminator_pool.call("open_application", app_name)
         print(f"Successfully requested Terminator to open '{app_name}'.")
         return True
-    except ApiError as e:
+    except (CircuitOpenError, ClientUnavailable) as e:
+        print(f"Skipping Terminator action: Open application '{app_name}' ({e})")
+        return False
+    except terminator_pool.api_errors as e:
         print(f"Terminator API Error opening application '{app_name}': {e}")
         return False
     except Exception as e:
@@ -46,34 +52,58 @@ def open_application_terminator(app_name):
 
 def open_url_terminator(url):
     """Uses Terminator to open a URL in the default browser."""
-    if not TERMINATOR_AVAILABLE:
+    if not terminator_available():
         print(f"Skipping Terminator action: Open URL '{url}'")
-        # Fallback to Python's built-in webbrowser
-        try:
-            print(f"Falling back to system browser for URL: {url}")
-            webbrowser.open(url)
-            return True
-        except Exception as e:
-            print(f"Error opening URL with system browser: {e}")
-            return False
+        return open_url_system_browser(url)
 
     print(f"Attempting to open URL: '{url}' using Terminator...")
     try:
-        terminator_client.open_url(url)
+        terminator_pool.call("open_url", url)
         print(f"Successfully requested Terminator to open URL '{url}'.")
         return True
-    except ApiError as e:
+    except (CircuitOpenError, ClientUnavailable) as e:
+        print(f"Terminator unavailable ({e}).")
+        return open_url_system_browser(url)
+    except terminator_pool.api_errors as e:
         print(f"Terminator API Error opening URL '{url}': {e}")
         return False
     except Exception as e:
         print(f"Unexpected error opening URL '{url}' with Terminator: {e}")
         return False
 
+def open_url_system_browser(url):
+    """Fallback to Python's built-in webbrowser."""
+    try:
+        print(f"Falling back to system browser for URL: {url}")
+        webbrowser.open(url)
+        return True
+    except Exception as e:
+        print(f"Error opening URL with system browser: {e}")
+        return False
+
+def open_urls_terminator(text):
+    """
+    Opens every URL in text (space/comma separated), or text itself if it is a single URL/domain.
+
+    Terminator's open_url takes a single URL, so several URLs cannot share one
+    browser launch here the way they do in the agent's BrowserLauncher. The
+    first URL is opened alone (starting the browser if needed); the rest go
+    out concurrently over the pooled clients instead of one round trip at a
+    time, so their tab order is not guaranteed.
+    """
+    urls = url_list(text) or [text]
+    first, rest = urls[0], urls[1:]
+    results = [open_url_terminator(first)]
+    if rest:
+        with ThreadPoolExecutor(max_workers=min(len(rest), terminator_pool.size),
+                                thread_name_prefix="vapi-open-url") as executor:
+            results.extend(executor.map(open_url_terminator, rest))
+    return all(results)
+
 def search_web_terminator(query):
     """Opens the default browser and searches Google for the query using Terminator."""
-    # Construct Google search URL
-    search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}"
-    return open_url_terminator(search_url)
+    # quote_plus encodes &, #, + and non-ASCII text, which a plain space replace did not
+    return open_url_terminator(search_url(query))
 
 def type_text_terminator(text_to_type):
     """
@@ -82,7 +112,7 @@ def type_text_terminator(text_to_type):
     This basic version attempts to type globally, which might not work as intended.
     A robust implementation needs element locators.
     """
-    if not TERMINATOR_AVAILABLE:
+    if not terminator_available():
         print(f"Skipping Terminator action: Type text '{text_to_type}'")
         return False
 
@@ -105,7 +135,7 @@ def type_text_terminator(text_to_type):
         # OR target a specific known element as shown above.
         return False # Return False as this basic version doesn't perform the action reliably
 
-    except ApiError as e:
+    except terminator_pool.api_errors as e:
         print(f"Terminator API Error typing text: {e}")
         return False
     except Exception as e:
@@ -114,6 +144,14 @@ def type_text_terminator(text_to_type):
 
 # --- VAPI Data Processing Logic ---
 
+# Intent action name (vapi_intents.Intent.action) -> Terminator action function
+ACTIONS = {
+    "open_application": open_application_terminator,
+    "open_url": open_urls_terminator,
+    "type_text": type_text_terminator,
+    "search_web": search_web_terminator,
+}
+
 def process_vapi_data(vapi_json_data):
     """
     Parses the structured data from VAPI and decides which Terminator action to trigger.
@@ -127,11 +165,13 @@ def process_vapi_data(vapi_json_data):
                                    "searchQuery": "SearchTermOrUrlOrNull"
                                  }
                                }
+    Returns:
+        bool: True if an action was identified and executed successfully.
     """
     print("\nProcessing VAPI data...")
     if not isinstance(vapi_json_data, dict):
         print("Error: Input data is not a valid dictionary.")
-        return
+        return False
 
     structured_data = vapi_json_data.get("structuredData")
     summary = vapi_json_data.get("summary", "No summary provided.")
@@ -139,7 +179,7 @@ def process_vapi_data(vapi_json_data):
 
     if not isinstance(structured_data, dict):
         print("Error: 'structuredData' field is missing or not a dictionary.")
-        return
+        return False
 
     app_name = structured_data.get("appName")
     search_query = structured_data.get("searchQuery")
@@ -147,31 +187,14 @@ def process_vapi_data(vapi_json_data):
     print(f"Parsed - appName: {app_name}, searchQuery: {search_query}")
 
     # --- Action Logic ---
+    # Routing rules live in the compiled intent table (vapi_intents.INTENTS)
     action_taken = False
-    if app_name and not search_query:
-        # Action: Open Application
-        print(f"Action: Open application '{app_name}'")
-        action_taken = open_application_terminator(app_name)
-
-    elif search_query:
-        # Action: Search or Open URL or Type
-        # Simple check if it looks like a URL
-        if search_query.startswith("http://") or search_query.startswith("https://") or "." in search_query.split(" ")[0]:
-            # Looks like a URL or domain - try opening directly
-            print(f"Action: Open URL '{search_query}'")
-            action_taken = open_url_terminator(search_query)
-        elif "type" in summary.lower() or "write" in summary.lower():
-            # If the summary suggests typing, try typing the query
-            # This is a basic heuristic and might need refinement
-            print(f"Action: Type text '{search_query}'")
-            action_taken = type_text_terminator(search_query)
-            if not action_taken:
-                 print("Typing failed or not implemented reliably. Consider focusing the target manually.")
-        else:
-            # Default to web search
-            print(f"Action: Search web for '{search_query}'")
-            action_taken = search_web_terminator(search_query)
-
+    chosen, argument = intent_dispatcher.match(structured_data, summary)
+    if chosen is not None:
+        print(f"Action: {chosen.description.format(arg=argument)}")
+        action_taken = ACTIONS[chosen.action](argument)
+        if not action_taken and chosen.action == "type_text":
+            print("Typing failed or not implemented reliably. Consider focusing the target manually.")
     else:
         print("No specific action identified from structuredData.")
 
@@ -179,6 +202,7 @@ def process_vapi_data(vapi_json_data):
         print("Warning: An action was identified but could not be executed successfully (Terminator might be unavailable or an error occurred).")
     elif action_taken:
         print("Action executed successfully.")
+    return action_taken
 
 
 # --- Example Usage ---
@@ -242,7 +266,7 @@ if __name__ == "__main__":
     print("\nExample script finished.")
 
     # Keep the script running briefly if Terminator needs time
-    if TERMINATOR_AVAILABLE:
+    if terminator_available():
         print("Waiting a few seconds for Terminator actions to potentially complete...")
         sleep(5)
 
@@ -0,0 +1,243 @@
+"""
+Async webhook ingestion service for VAPI.
+
+VAPI posts end-of-call reports (with the assistant's structuredData) to
+POST /vapi/webhook. The payload is validated, put on a bounded queue and
+acknowledged with 202 right away; a pool of dispatcher tasks then runs
+process_vapi_data concurrently on worker threads, so VAPI never waits on a
+desktop action.
+
+Run with:  python vapi_webhook_server.py   (listens on 127.0.0.1:8001)
+
+Listening beyond loopback (VAPI_WEBHOOK_HOST) requires VAPI_WEBHOOK_SECRET.
+"""
+import asyncio
+import hmac
+import ipaddress
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+
+import vapi_terminator_integration as vapi
+
+# --- Ingestion Settings ---
+QUEUE_SIZE = int(os.environ.get("VAPI_QUEUE_SIZE", "100"))
+DISPATCH_CONCURRENCY = int(os.environ.get("VAPI_DISPATCH_CONCURRENCY", "4"))
+# Seconds after which a dispatch is reported as slow (the desktop action itself keeps running)
+DISPATCH_TIMEOUT = float(os.environ.get("VAPI_DISPATCH_TIMEOUT", "60"))
+# Shared secret configured on the VAPI assistant's server URL (sent as X-Vapi-Secret)
+WEBHOOK_SECRET = os.environ.get("VAPI_WEBHOOK_SECRET")
+WEBHOOK_HOST = os.environ.get("VAPI_WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("VAPI_WEBHOOK_PORT", "8001"))
+# Message types that carry the call analysis; everything else is acknowledged and ignored
+ACTIONABLE_TYPES = {"end-of-call-report"}
+RETRY_AFTER_SECONDS = 2
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def secret_matches(received):
+    """Constant-time comparison, so response timing does not leak the secret."""
+    return hmac.compare_digest((received or "").encode("utf-8"), WEBHOOK_SECRET.encode("utf-8"))
+
+
+# --- Webhook Schema ---
+class StructuredData(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    appName: str | None = Field(None, max_length=260)
+    searchQuery: str | None = Field(None, max_length=4096)
+
+class Analysis(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    summary: str | None = None
+    structuredData: StructuredData | None = None
+
+class VapiMessage(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    type: str
+    analysis: Analysis | None = None
+    call: dict[str, Any] | None = None
+
+class VapiWebhook(BaseModel):
+    """Either VAPI's {"message": {...}} envelope or the flat {"summary", "structuredData"} shape."""
+    model_config = ConfigDict(extra="allow")
+    message: VapiMessage | None = None
+    summary: str | None = None
+    structuredData: StructuredData | None = None
+
+    def to_vapi_data(self):
+        """The dict process_vapi_data expects, or None if there is nothing to act on."""
+        if self.message is not None:
+            if self.message.type not in ACTIONABLE_TYPES or self.message.analysis is None:
+                return None
+            summary, structured = self.message.analysis.summary, self.message.analysis.structuredData
+        else:
+            summary, structured = self.summary, self.structuredData
+        if structured is None:
+            return None
+        return {"summary": summary or "No summary provided.", "structuredData": structured.model_dump()}
+
+    def call_id(self):
+        if self.message is not None and self.message.call:
+            return self.message.call.get("id")
+        return None
+
+
+# --- Dispatcher ---
+class WebhookDispatcher:
+    """Bounded queue of webhook payloads drained by concurrent dispatcher tasks."""
+
+    def __init__(self, queue_size=QUEUE_SIZE, concurrency=DISPATCH_CONCURRENCY, timeout=DISPATCH_TIMEOUT):
+        self.queue_size = queue_size
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.queue = None
+        self._tasks = []
+        self.counters = {"accepted": 0, "ignored": 0, "rejected": 0,
+                         "succeeded": 0, "no_action": 0, "failed": 0, "slow": 0}
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.concurrency)]
+
+    async def stop(self, drain_timeout=10.0):
+        """Gives queued webhooks a chance to finish, then cancels the dispatchers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"VAPI ingestion: {self.queue.qsize()} webhooks still queued at shutdown.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, item):
+        """Queues a webhook without waiting; returns False if the queue is full."""
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            return False
+        self.counters["accepted"] += 1
+        return True
+
+    async def _worker(self, index):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self._dispatch(item)
+            finally:
+                self.queue.task_done()
+
+    async def _dispatch(self, item):
+        started = time.monotonic()
+        # process_vapi_data blocks on the Terminator client; run it on a thread.
+        # shield() keeps the thread's result from being lost if we stop waiting.
+        work = asyncio.ensure_future(asyncio.to_thread(vapi.process_vapi_data, item["data"]))
+        try:
+            action_taken = await asyncio.wait_for(asyncio.shield(work), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["slow"] += 1
+            print(f"VAPI ingestion: webhook {item['id']} still running after {self.timeout:.0f}s.")
+            try:
+                action_taken = await work
+            except Exception as e:
+                self.counters["failed"] += 1
+                print(f"VAPI ingestion: webhook {item['id']} failed: {e}")
+                return
+        except Exception as e:
+            self.counters["failed"] += 1
+            print(f"VAPI ingestion: webhook {item['id']} failed: {e}")
+            return
+        self.counters["succeeded" if action_taken else "no_action"] += 1
+        print(f"VAPI ingestion: webhook {item['id']} (call {item['call_id']}) handled in "
+              f"{time.monotonic() - started:.2f}s, action_taken={action_taken}")
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+            "concurrency": self.concurrency,
+            "terminator_available": vapi.terminator_available(),
+            **self.counters,
+        }
+
+
+dispatcher = WebhookDispatcher()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await dispatcher.start()
+    yield
+    await dispatcher.stop()
+    vapi.terminator_pool.stop_health_monitor()
+
+# --- FastAPI Setup ---
+app = FastAPI(
+    title="VAPI Webhook Ingestion",
+    description="Accepts VAPI webhooks and dispatches Terminator actions in the background.",
+    version="0.1.0",
+    lifespan=lifespan,
+)
+
+# --- API Endpoints ---
+@app.post("/vapi/webhook", summary="Receive a VAPI webhook", status_code=202)
+async def receive_webhook(payload: VapiWebhook, x_vapi_secret: str | None = Header(None)):
+    """
+    Validates and queues a VAPI webhook, answering immediately.
+
+    End-of-call reports with structuredData are dispatched to Terminator;
+    other message types are acknowledged and ignored.
+    """
+    if WEBHOOK_SECRET and not secret_matches(x_vapi_secret):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Vapi-Secret header.")
+
+    data = payload.to_vapi_data()
+    if data is None:
+        dispatcher.counters["ignored"] += 1
+        message_type = payload.message.type if payload.message else "flat"
+        return {"status": "ignored", "message": f"No structuredData to act on (type '{message_type}')."}
+
+    item = {"id": uuid.uuid4().hex, "call_id": payload.call_id(), "data": data}
+    if not dispatcher.submit(item):
+        return JSONResponse(status_code=429, headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+                            content={"detail": "Ingestion queue is full, retry later."})
+    return {"status": "accepted", "id": item["id"], "queue_depth": dispatcher.queue.qsize()}
+
+@app.get("/vapi/stats", summary="Ingestion queue and dispatch counters")
+async def get_stats():
+    return dispatcher.stats()
+
+@app.get("/vapi/terminator", summary="Terminator connection pool and circuit breaker state")
+async def get_terminator_state():
+    return vapi.terminator_pool.snapshot()
+
+# --- Health Check Endpoint ---
+@app.get("/", summary="Health check")
+async def root():
+    return {"message": "VAPI webhook ingestion is running.", "stats": dispatcher.stats()}
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    import uvicorn
+    if not WEBHOOK_SECRET:
+        if not is_loopback(WEBHOOK_HOST):
+            raise SystemExit(f"Refusing to listen on {WEBHOOK_HOST} without VAPI_WEBHOOK_SECRET: "
+                             "anyone who can reach the port could trigger desktop actions.")
+        print("WARNING: VAPI_WEBHOOK_SECRET is not set, webhooks are accepted without authentication. "
+              "Set it before exposing this port through a tunnel.")
+    print(f"Starting VAPI webhook ingestion on http://{WEBHOOK_HOST}:{WEBHOOK_PORT}")
+    print("Point the assistant's Server URL at /vapi/webhook (expose it with a tunnel if needed).")
+    uvicorn.run(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT)